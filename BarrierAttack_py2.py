@@ -1,7 +1,23 @@
 import pyxel
+import numpy as np  # requirements.txt にも書いてある (Web版の index.html は元のゲームのまま)
+import argparse
+import atexit
+import hashlib
+from array import array
+from collections import Counter, deque
+import gc
 import math
+import queue
 import random
 import json
+import struct
+import sys
+import threading
+import time
+import zlib
+
+SCREEN_WIDTH = 320
+SCREEN_HEIGHT = 240
 
 
 # --- ゲームの状態管理 ---
@@ -12,165 +28,2155 @@ class GameState:
     GAME_OVER = 3
 
 
+# 予約するサウンド命令 (0以上は効果音のサウンド番号)
+AUDIO_PLAY_BGM = -1
+AUDIO_STOP = -2
+
+
+# --- 入力 ---
+# 1フレーム分の入力をまとめたビットマスク (記録や通信、ボットからも同じ形で渡す)
+INPUT_LEFT = 1 << 0
+INPUT_RIGHT = 1 << 1
+INPUT_FIRE = 1 << 2
+INPUT_START = 1 << 3
+INPUT_REWIND = 1 << 4
+INPUT_TURBO_UP = 1 << 5
+INPUT_TURBO_DOWN = 1 << 6
+
+# ビットごとに、どれかが押されていればオンにするキーとボタン
+INPUT_BINDINGS = (
+    (INPUT_LEFT, (pyxel.KEY_LEFT, pyxel.GAMEPAD1_BUTTON_DPAD_LEFT)),
+    (INPUT_RIGHT, (pyxel.KEY_RIGHT, pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT)),
+    (INPUT_FIRE, (pyxel.KEY_CTRL, pyxel.GAMEPAD1_BUTTON_A)),
+    (INPUT_START, (pyxel.KEY_RETURN, pyxel.GAMEPAD1_BUTTON_START)),
+    (INPUT_REWIND, (pyxel.KEY_BACKSPACE,)),
+    (INPUT_TURBO_UP, (pyxel.KEY_PAGEUP,)),
+    (INPUT_TURBO_DOWN, (pyxel.KEY_PAGEDOWN,)),
+)
+AXIS_DEADZONE = 8000  # アナログスティックの遊び (最大32767)
+TURBO_MAX_STEPS = 64  # 早送りで1フレームに進めるシミュレーションの最大回数
+
+
+def sample_input():
+    """キーボードとゲームパッドを1回ずつ調べてビットマスクを返す"""
+    bits = 0
+    for bit, keys in INPUT_BINDINGS:
+        for key in keys:
+            if pyxel.btn(key):
+                bits |= bit
+                break
+    axis = pyxel.btnv(pyxel.GAMEPAD1_AXIS_LEFTX)
+    if axis < -AXIS_DEADZONE:
+        bits |= INPUT_LEFT
+    elif axis > AXIS_DEADZONE:
+        bits |= INPUT_RIGHT
+    return bits
+
+
+def no_input():
+    """ヘッドレス用の入力元 (何も押していない)"""
+    return 0
+
+
+REPLAY_VERSION = 1
+
+
+class InputRecorder:
+    """入力元を包み、フレームごとの入力を (ビット, 続いたフレーム数) の並びで記録する"""
+
+    def __init__(self, source):
+        self.source = source
+        self.runs = []
+
+    def __call__(self):
+        bits = self.source()
+        if self.runs and self.runs[-1][0] == bits:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([bits, 1])
+        return bits
+
+    def save(self, path, **settings):
+        """入力を、同じ進み方にするための設定 (シードなど) と一緒に書き出す"""
+        with open(path, "wt") as fout:
+            json.dump(
+                {"version": REPLAY_VERSION, **settings, "inputs": self.runs}, fout
+            )
+
+
+class ReplayInput:
+    """記録した入力を1フレームずつ返す入力元 (記録が終わったら何も押さない)"""
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.run_index = 0
+        self.remaining = runs[0][1] if runs else 0
+
+    def __len__(self):
+        return sum(count for _, count in self.runs)
+
+    def __call__(self):
+        while not self.remaining:
+            if self.run_index + 1 >= len(self.runs):
+                return 0
+            self.run_index += 1
+            self.remaining = self.runs[self.run_index][1]
+        self.remaining -= 1
+        return self.runs[self.run_index][0]
+
+
+def load_replay(path):
+    """記録ファイルを読み、(App に渡す設定, 入力元) を返す"""
+    with open(path, "rt") as fin:
+        replay = json.load(fin)
+    if replay.pop("version", None) != REPLAY_VERSION:
+        raise ValueError(f"リプレイファイルの形式が違います: {path}")
+    return replay, ReplayInput(replay.pop("inputs"))
+
+
 # --- エンティティの定義 ---
+# 固定小数点モードでは位置と速度を1ピクセル = SUBPIXEL の整数で持つ
+SUBPIXEL = 256
+
+
+def to_units(value, unit):
+    """ピクセル単位の値を unit 倍の単位にする (固定小数点なら整数に丸める)"""
+    return value if unit == 1 else round(value * unit)
+
+
+MINOR_ALIEN_COLUMNS = 16
+MINOR_ALIEN_ROWS = 8
+MINOR_ALIEN_COLORS = (8, 9, 12, 10, 11, 7)
+
+
 class Player:
-    def __init__(self):
+    def __init__(self, unit=1):
+        self.unit = unit
         self.reset()
 
     def reset(self, is_demo=False):
-        self.x = pyxel.width / 2 - 6  # プレイヤーサイズの半分
-        self.y = pyxel.height - 25
-        self.w = 12  # 全体的にサイズを半分に
-        self.h = 8
-        self.speed = 2  # スピードも調整
+        unit = self.unit
+        self.x = (SCREEN_WIDTH // 2 - 6) * unit  # プレイヤーサイズの半分
+        self.y = (SCREEN_HEIGHT - 25) * unit
+        self.w = 12 * unit  # 全体的にサイズを半分に
+        self.h = 8 * unit
+        self.speed = 2 * unit  # スピードも調整
+        self.prev_x, self.prev_y = self.x, self.y  # 描画で補間する前の位置
         self.is_alive = True
         self.respawn_timer = 0
         self.invincibility_timer = 9999 if is_demo else 180  # 60fps * 3s
 
-    def draw(self):
+    def draw(self, gfx, frame_count):
         if not self.is_alive:
             return
         # 無敵時間中の点滅エフェクト
-        if self.invincibility_timer > 0 and pyxel.frame_count % 10 < 5:
+        if self.invincibility_timer > 0 and frame_count % 10 < 5:
             return
-        pyxel.rect(self.x, self.y + 4, self.w, 4, 11)
-        pyxel.rect(self.x + 2, self.y, self.w - 4, 4, 11)
-        pyxel.rect(self.x + 5, self.y + 2, 2, 2, 7)
+        gfx.rect(self.x, self.y + 4, self.w, 4, 11)
+        gfx.rect(self.x + 2, self.y, self.w - 4, 4, 11)
+        gfx.rect(self.x + 5, self.y + 2, 2, 2, 7)
 
 
 class Station:
-    def __init__(self):
+    def __init__(self, unit=1):
+        self.unit = unit
         self.reset()
 
     def reset(self):
-        self.x = 5
-        self.y = 15
-        self.w = 24
-        self.h = 12
+        unit = self.unit
+        self.x = 5 * unit
+        self.y = 15 * unit
+        self.w = 24 * unit
+        self.h = 12 * unit
         self.is_alive = True
 
-    def draw(self):
+    def draw(self, gfx):
         if not self.is_alive:
             return
-        pyxel.rect(self.x, self.y + 4, self.w, 4, 13)
-        pyxel.rect(self.x + 4, self.y, self.w - 8, 12, 13)
-        pyxel.rect(self.x + 10, self.y + 2, 4, 8, 12)
+        gfx.rect(self.x, self.y + 4, self.w, 4, 13)
+        gfx.rect(self.x + 4, self.y, self.w - 8, 12, 13)
+        gfx.rect(self.x + 10, self.y + 2, 4, 8, 12)
 
 
 class LargeMissile:
-    def __init__(self):
+    def __init__(self, index=0, unit=1):
+        self.index = index
+        self.unit = unit
         self.reset()
 
     def reset(self):
-        self.x = pyxel.width - 25
-        self.y = 15
-        self.w = 20
-        self.h = 8
-        self.speed = 0.25
+        unit = self.unit
+        # 複数いる場合は右側の画面外へ順番に並べる
+        self.x = (SCREEN_WIDTH - 25 + self.index * 40) * unit
+        self.y = 15 * unit
+        self.w = 20 * unit
+        self.h = 8 * unit
+        self.speed = to_units(0.25, unit)
+        self.prev_x, self.prev_y = self.x, self.y
         self.is_alive = True
+        self.respawn_timer = 0
 
-    def draw(self):
+    def draw(self, gfx):
         if not self.is_alive:
             return
-        pyxel.rect(self.x, self.y, self.w, self.h, 10)
-        pyxel.rect(self.x - 2, self.y + 2, 2, 4, 8)
-        pyxel.rect(self.x + self.w, self.y + 2, 2, 4, 8)
+        gfx.rect(self.x, self.y, self.w, self.h, 10)
+        gfx.rect(self.x - 2, self.y + 2, 2, 4, 8)
+        gfx.rect(self.x + self.w, self.y + 2, 2, 4, 8)
 
 
 class BarrierAlien:
-    def __init__(self):
+    def __init__(self, index=0, unit=1):
+        self.index = index
+        self.unit = unit
         self.reset()
 
     def reset(self):
-        self.x = pyxel.width / 2
-        self.y = 65
-        self.w = 10
-        self.h = 8
-        self.speed = 1.25
+        unit = self.unit
+        self.x = (SCREEN_WIDTH // 2 + self.index * 37) % (SCREEN_WIDTH - 10) * unit
+        self.y = 65 * unit
+        self.w = 10 * unit
+        self.h = 8 * unit
+        self.speed = to_units(1.25, unit)
+        self.prev_x, self.prev_y = self.x, self.y
         self.direction = 1
         self.is_alive = True
 
-    def draw(self):
+    def draw(self, gfx):
         if not self.is_alive:
             return
-        pyxel.rect(self.x, self.y, self.w, self.h, 11)
-        pyxel.rect(self.x + 2, self.y + 2, 2, 2, 7)
-        pyxel.rect(self.x + 6, self.y + 2, 2, 2, 7)
+        gfx.rect(self.x, self.y, self.w, self.h, 11)
+        gfx.rect(self.x + 2, self.y + 2, 2, 2, 7)
+        gfx.rect(self.x + 6, self.y + 2, 2, 2, 7)
 
 
 class MinorAlien:
-    def __init__(self, index):
+    def __init__(self, index, unit=1):
         self.original_index = index
+        self.unit = unit
         self.spawn_y = 90
         self.reset()
 
     def reset(self):
-        # 解像度に合わせた配置
-        self.x = 10 + self.original_index * 19
-        self.y = self.spawn_y
-        self.w = 8
-        self.h = 8
+        unit = self.unit
+        # 解像度に合わせた配置 (16体ごとに改行し、8列を超えたら少しずらして重ねる)
+        row, column = divmod(self.original_index, MINOR_ALIEN_COLUMNS)
+        layer, row = divmod(row, MINOR_ALIEN_ROWS)
+        self.x = (10 + column * 19 + layer * 5 % 19) * unit
+        self.y = (self.spawn_y + row * 10) * unit
+        self.w = 8 * unit
+        self.h = 8 * unit
+        self.prev_x, self.prev_y = self.x, self.y
         self.is_falling = False
         self.fall_speed_y = 0
         self.fall_speed_x = 0
 
-    def draw(self):
-        colors = [8, 9, 12, 10, 11, 7]
-        color = colors[self.original_index % len(colors)]
-        pyxel.rect(self.x, self.y, self.w, self.h, color)
+    def draw(self, gfx):
+        color = MINOR_ALIEN_COLORS[self.original_index % len(MINOR_ALIEN_COLORS)]
+        gfx.rect(self.x, self.y, self.w, self.h, color)
+
+
+# 小さい敵の状態 (MinorAlienSet のリストの番号)
+ALIEN_IDLE = 0
+ALIEN_FALLING = 1
+ALIEN_DESTROYED = 2
+
+
+class MinorAlienSet:
+    """小さい敵を状態ごとのリストに分けて持ち、状態の移動をO(1)で行う"""
+
+    def __init__(self, box_type=np.float64):
+        self.lists = ([], [], [])
+        self.idle, self.falling, self.destroyed = self.lists
+        # 隊列にいる敵は動かないので、矩形を idle と同じ並びの配列でも持っておく
+        # (弾の位置と同じ型にして、比べるときに変換が起きないようにする)
+        self.idle_boxes = np.zeros((64, 4), box_type)
+
+    def __len__(self):
+        return len(self.idle) + len(self.falling)
+
+    def __iter__(self):
+        """生きている敵を、隊列にいるもの、落下中のものの順に返す"""
+        yield from self.idle
+        yield from self.falling
+
+    def at(self, index):
+        """__iter__ の並びで index 番目の敵を返す"""
+        if index < len(self.idle):
+            return self.idle[index]
+        return self.falling[index - len(self.idle)]
+
+    def clear(self):
+        for aliens in self.lists:
+            aliens.clear()
+
+    def add(self, alien, state):
+        alien.state = state
+        alien.slot = len(self.lists[state])
+        self.lists[state].append(alien)
+        if state == ALIEN_IDLE:
+            if alien.slot >= len(self.idle_boxes):
+                self.idle_boxes = np.concatenate(
+                    (self.idle_boxes, np.zeros_like(self.idle_boxes))
+                )
+            self.idle_boxes[alien.slot] = (alien.x, alien.y, alien.w, alien.h)
+
+    def discard(self, alien):
+        """末尾の敵を空いた位置に移して取り除く"""
+        aliens = self.lists[alien.state]
+        last = aliens.pop()
+        if last is not alien:
+            aliens[alien.slot] = last
+            if alien.state == ALIEN_IDLE:
+                self.idle_boxes[alien.slot] = self.idle_boxes[last.slot]
+            last.slot = alien.slot
+
+    def boxes(self):
+        """生きている敵の矩形を __iter__ と同じ順に (x, y, w, h) の列の配列で返す"""
+        idle_boxes = self.idle_boxes[: len(self.idle)]
+        if not self.falling:
+            return idle_boxes.T
+        falling_boxes = np.array(
+            [(a.x, a.y, a.w, a.h) for a in self.falling], idle_boxes.dtype
+        )
+        return np.concatenate((idle_boxes, falling_boxes)).T
 
+    def start_falling(self, alien):
+        self.discard(alien)
+        alien.is_falling = True
+        self.add(alien, ALIEN_FALLING)
 
-class Bullet:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.w = 2
-        self.h = 5
-        self.speed = 4
+    def land(self, alien):
+        """画面外に落ちた敵を隊列の元の位置に戻す"""
+        self.discard(alien)
+        alien.reset()
+        self.add(alien, ALIEN_IDLE)
 
-    def draw(self):
-        pyxel.rect(self.x, self.y, self.w, self.h, 7)
+    def destroy(self, alien):
+        self.discard(alien)
+        self.add(alien, ALIEN_DESTROYED)
 
+    def spawn(self, count):
+        """番号が count 未満の撃破済みの敵を番号順に隊列へ戻す"""
+        destroyed = sorted(self.destroyed, key=minor_alien_index)
+        self.destroyed.clear()
+        for alien in destroyed:
+            if alien.original_index < count:
+                alien.reset()
+                self.add(alien, ALIEN_IDLE)
+            else:
+                self.add(alien, ALIEN_DESTROYED)
 
-class Particle:
-    def __init__(self, x, y, options):
-        self.x = x
-        self.y = y
-        angle = random.uniform(0, math.pi * 2)
-        velocity = random.uniform(0, options.get("speed", 2))
-        self.vx = math.cos(angle) * velocity
-        self.vy = math.sin(angle) * velocity
-        self.life = options.get("life", 30) + random.uniform(
-            0, options.get("life", 30) * 0.5
-        )
-        self.start_life = self.life
-        self.color = options.get("color", 10)
-        self.size = options.get("size", 2)
+
+def minor_alien_index(alien):
+    return alien.original_index
+
+
+class ScratchArrays:
+    """毎フレーム使う作業用の配列を名前ごとに取っておき、使い回す"""
+
+    def __init__(self):
+        self.arrays = {}
+        self.views = {}  # 前回返した形の配列 (同じ形ならビューも作り直さない)
+
+    def get(self, name, shape, dtype=np.float64):
+        """name の作業用配列を shape の形で返す (中身は不定で、次に同じ名前で取るまで使える)"""
+        if isinstance(shape, int):
+            shape = (shape,)
+        key = (name, dtype)
+        view = self.views.get(key)
+        if view is None or view.shape != shape:
+            size = math.prod(shape)
+            array = self.arrays.get(key)
+            if array is None or len(array) < size:
+                # 数が増えるたびに確保し直さないように倍ずつ広げる
+                capacity = 64 if array is None else 2 * len(array)
+                array = np.empty(max(size, capacity), dtype)
+                self.arrays[key] = array
+            view = array[:size].reshape(shape)
+            self.views[key] = view
+        return view
+
+
+def kept_indices(keep, count, scratch):
+    """keep が真のもの (count 個) の番号を前から順に並べた配列を返す
+
+    np.compress や np.flatnonzero は呼ぶたびに番号の配列を確保するので、作業用の
+    配列で番号を求めておき、同じ条件で詰める配列ごとに np.take に渡す。
+    """
+    n = len(keep)
+    # 残すものの移し先の番号 (消すものは末尾の捨て場所に送る)
+    destinations = scratch.get("destinations", n, np.intp)
+    np.copyto(destinations, keep)
+    np.add.accumulate(destinations, out=destinations)
+    destinations -= 1
+    dropped = np.logical_not(keep, out=scratch.get("dropped", n, bool))
+    np.copyto(destinations, n, where=dropped)
+    positions = scratch.get("positions", n, np.intp)
+    np.copyto(positions, 1)
+    np.add.accumulate(positions, out=positions)
+    positions -= 1
+    indices = scratch.get("kept_indices", n + 1, np.intp)
+    np.put(indices, destinations, positions)
+    return indices[:count]
+
+
+class EntityArrays:
+    """エンティティを項目ごとのNumPy配列で持つ (先頭 count 個が有効)"""
+
+    FIELDS = ()  # (項目名, dtype) の並び
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.capacity = capacity
+        self.scratch = ScratchArrays()
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def reserve(self, count):
+        """count 個入るように配列を広げる (足りないときは倍にする)"""
+        if count <= self.capacity:
+            return
+        capacity = max(count, self.capacity * 2)
+        for name, dtype in self.FIELDS:
+            array = np.zeros(capacity, dtype)
+            array[: self.count] = getattr(self, name)[: self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def compact(self, keep):
+        """keep が真のものだけを並び順を保ったまま前に詰める"""
+        n = self.count
+        kept = int(np.count_nonzero(keep))
+        if kept < n:
+            indices = kept_indices(keep, kept, self.scratch)
+            for name, dtype in self.FIELDS:
+                array = getattr(self, name)
+                # 詰めた結果をいったん作業用の配列に取り出してから書き戻す
+                kept_values = self.scratch.get("kept_values", kept, dtype)
+                np.take(array[:n], indices, out=kept_values, mode="clip")
+                array[:kept] = kept_values
+            self.count = kept
+
+    def copy(self):
+        entities = type(self)(max(1, self.count))
+        for name, _ in self.FIELDS:
+            getattr(entities, name)[: self.count] = getattr(self, name)[: self.count]
+        entities.count = self.count
+        return entities
+
+    def to_bytes(self, record_type):
+        """セーブステート用に、record_type の並びでバイト列にする"""
+        records = np.empty(self.count, record_type)
+        for name in record_type.names:
+            records[name] = getattr(self, name)[: self.count]
+        return records.tobytes()
+
+    def load_bytes(self, data, count, record_type):
+        records = np.frombuffer(data, record_type, count)
+        self.count = 0
+        self.reserve(count)
+        for name in record_type.names:
+            getattr(self, name)[:count] = records[name]
+        self.count = count
+
+
+BULLET_WIDTH = 2
+BULLET_HEIGHT = 5
+BULLET_SPEED = 4
+
+
+class BulletArrays(EntityArrays):
+    """自機の弾の位置をまとめて持ち、1回の演算で進める"""
+
+    FIELDS = (("x", np.float64), ("y", np.float64))
+    SPEED = BULLET_SPEED
+
+    def __init__(self, capacity=64):
+        super().__init__(capacity)
+
+    def add(self, x, y):
+        self.reserve(self.count + 1)
+        self.x[self.count] = x
+        self.y[self.count] = y
+        self.count += 1
+
+    def update(self, ticks=1):
+        """ticks フレーム分上に進め、画面の上に出たものを取り除く"""
+        if not self.count:
+            return
+        y = self.y[: self.count]
+        y -= self.SPEED * ticks
+        # 全部残るときは compact が何もしない (y.min() などの集計は作業領域を確保する)
+        self.compact(np.greater_equal(y, 0, out=self.scratch.get("keep", len(y), bool)))
+
+    def remove(self, indices):
+        keep = np.ones(self.count, bool)
+        keep[indices] = False
+        self.compact(keep)
+
+    def draw(self, gfx):
+        for x, y in zip(self.x[: self.count].tolist(), self.y[: self.count].tolist()):
+            gfx.rect(x, y, BULLET_WIDTH, BULLET_HEIGHT, 7)
+
+    def to_pixels(self, unit):
+        """描画用に、ピクセル単位の BulletArrays にした複製を返す"""
+        bullets = BulletArrays(max(1, self.count))
+        bullets.x[: self.count] = self.x[: self.count] / unit
+        bullets.y[: self.count] = self.y[: self.count] / unit
+        bullets.count = self.count
+        return bullets
+
+
+class FixedBulletArrays(BulletArrays):
+    """固定小数点モードの弾 (位置はサブピクセルの整数)"""
+
+    FIELDS = (("x", np.int32), ("y", np.int32))
+    SPEED = BULLET_SPEED * SUBPIXEL
+
+
+# 衝突イベントの種類 (App.collision_counts の番号)
+HIT_STATION = 0
+HIT_BARRIER = 1
+HIT_MISSILE = 2
+HIT_BARRIER_ALIEN = 3
+HIT_MINOR_ALIEN = 4
+HIT_PLAYER = 5
+COLLISION_NAMES = (
+    "station",
+    "barrier",
+    "missile",
+    "barrier_alien",
+    "minor_alien",
+    "player",
+)
+
+
+def first_hit(targets, hits, claimed):
+    """重なっている相手のうち、生きていてまだ倒されることになっていない最初のもの"""
+    for j in np.flatnonzero(hits).tolist():
+        target = targets[j]
+        if target.is_alive and target not in claimed:
+            return target
+    return None
+
+
+def entity_boxes(entities, scratch, name):
+    """エンティティの矩形を scratch の name の作業用配列に (x, y, w, h) の列にして返す"""
+    boxes = scratch.get(name, (4, len(entities)))
+    for i, entity in enumerate(entities):
+        boxes[0, i] = entity.x
+        boxes[1, i] = entity.y
+        boxes[2, i] = entity.w
+        boxes[3, i] = entity.h
+    return boxes
+
+
+def overlap_matrix(x, y, w, h, boxes, scratch, name):
+    """x, y の配列の矩形 (幅 w, 高さ h) と boxes の重なりを 矩形の数×boxesの数 の表で返す
+
+    表と途中の値は scratch の作業用配列に作り、表は name で次に取るまで使える。
+    """
+    tx, ty, tw, th = boxes
+    shape = (len(x), len(tx))
+    hits = scratch.get(name, shape, bool)
+    test = scratch.get("overlap_test", shape, bool)
+    partial = scratch.get("overlap_partial", shape, bool)
+    rects = scratch.get("overlap_rects", shape)
+    targets = scratch.get("overlap_targets", shape)
+    rect_edges = scratch.get("overlap_rect_edges", len(x))
+    target_edges = scratch.get("overlap_target_edges", len(tx))
+    # is_colliding と同じ条件を全部の組み合わせで一度に調べる
+    # (広げながら比べたり、要素が1個の配列をその場で書き換えたりすると
+    # NumPyが一時的なバッファを作るので、表の形に写してから別の配列に書く)
+    np.copyto(rects, x[:, None])
+    np.copyto(targets, np.add(tx, tw, out=target_edges))
+    np.less(rects, targets, out=partial)
+    np.copyto(rects, np.add(x, w, out=rect_edges)[:, None])
+    np.copyto(targets, tx)
+    np.logical_and(partial, np.greater(rects, targets, out=test), out=hits)
+    np.copyto(rects, y[:, None])
+    np.copyto(targets, np.add(ty, th, out=target_edges))
+    np.logical_and(hits, np.less(rects, targets, out=test), out=partial)
+    np.copyto(rects, np.add(y, h, out=rect_edges)[:, None])
+    np.copyto(targets, ty)
+    np.logical_and(partial, np.greater(rects, targets, out=test), out=hits)
+    return hits
+
+
+def overlapping(rect, boxes):
+    """矩形 rect と重なる boxes の番号を返す"""
+    tx, ty, tw, th = boxes
+    hits = rect.x < tx + tw
+    hits &= rect.x + rect.w > tx
+    hits &= rect.y < ty + th
+    hits &= rect.y + rect.h > ty
+    return np.flatnonzero(hits).tolist()
+
+
+# 固定小数点モードのバリアの波に使う sin の表
+SINE_TABLE_SIZE = 1024
+PI_FIXED = 14488038916154245684  # π * 2**62
+
+
+def integer_sine_table(size=SINE_TABLE_SIZE, scale=SUBPIXEL):
+    """sin(2πk/size) * scale を整数演算だけで求めた表 (どの環境でも同じ値になる)"""
+    one = 1 << 62
+    quarter = size // 4
+    table = []
+    for k in range(size):
+        quadrant, m = divmod(k, quarter)
+        if quadrant % 2:
+            m = quarter - m
+        # 0〜π/2 に折り返してからテイラー展開する
+        angle = 2 * PI_FIXED * m // size
+        total = 0
+        term = angle
+        n = 1
+        while term:
+            total += term
+            term = -term * angle // one * angle // one // ((n + 1) * (n + 2))
+            n += 2
+        value = (total * scale + one // 2) >> 62
+        table.append(-value if quadrant >= 2 else value)
+    return np.array(table, np.int64)
+
+
+SINE_TABLE = integer_sine_table()
+
+
+# 点が画面に入る座標の範囲 (pset は0.5を0から遠い方へ丸める)
+VISIBLE_MIN = -0.5
+VISIBLE_MAX_X = SCREEN_WIDTH - 0.5
+VISIBLE_MAX_Y = SCREEN_HEIGHT - 0.5
+
+
+class ParticleArrays(EntityArrays):
+    """パーティクルを項目ごとのNumPy配列で持ち、まとめて更新する"""
+
+    FIELDS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("vx", np.float64),
+        ("vy", np.float64),
+        ("life", np.float64),
+        ("start_life", np.float64),
+        ("color", np.uint8),
+        ("size", np.uint8),
+    )
+
+    def add(self, x, y, vx, vy, life, color, size):
+        """同じ位置から出るパーティクルを速度と寿命の配列の数だけ追加する"""
+        start = self.count
+        end = start + len(vx)
+        self.reserve(end)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = vx
+        self.vy[start:end] = vy
+        self.life[start:end] = life
+        self.start_life[start:end] = life
+        self.color[start:end] = color
+        self.size[start:end] = size
+        self.count = end
 
     def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.vy += 0.1
-        self.life -= 1
+        """1フレーム進めて寿命が尽きたものと二度と映らないものを取り除く
+
+        画面外に出て早めに消した数と、それで省けた更新の回数を返す。
+        """
+        n = self.count
+        if not n:
+            return 0, 0
+        x = self.x[:n]
+        y = self.y[:n]
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        life = self.life[:n]
+        x += vx
+        y += vy
+        vy += 0.1
+        life -= 1
+
+        # 判定の途中の値は作業用の配列に書き、フレームごとに確保しない
+        scratch = self.scratch
+        alive = np.greater(life, 0, out=scratch.get("alive", n, bool))
+        gone = scratch.get("gone", n, bool)
+        leaving = scratch.get("leaving", n, bool)
+        test = scratch.get("test", n, bool)
+        # 重力で下に落ちていくものと、横に出て離れていくものは二度と映らない
+        np.greater_equal(y, VISIBLE_MAX_Y, out=gone)
+        gone &= np.greater_equal(vy, 0, out=test)
+        np.less_equal(x, VISIBLE_MIN, out=leaving)
+        leaving &= np.less_equal(vx, 0, out=test)
+        gone |= leaving
+        np.greater_equal(x, VISIBLE_MAX_X, out=leaving)
+        leaving &= np.greater_equal(vx, 0, out=test)
+        gone |= leaving
+        gone &= alive
+        retired = int(np.count_nonzero(gone))
+        saved = 0
+        if retired:
+            whole_life = np.trunc(life, out=scratch.get("whole_life", n))
+            weights = scratch.get("weights", n)
+            np.copyto(weights, gone)
+            saved = int(np.dot(whole_life, weights))
+        self.compact(np.logical_xor(alive, gone, out=alive))
+        return retired, saved
+
+    def visible_points(self, cutoff):
+        """描く点の整数座標と色の配列、画面外で描かずに済ませた数を返す
+
+        配列は作業用の配列なので、次に呼ぶまでに使い終えること。
+        """
+        n = self.count
+        scratch = self.scratch
+        x = self.x[:n]
+        y = self.y[:n]
+        life = self.life[:n]
+        start_life = self.start_life[:n]
+        # 負荷が高いときは消えかけのものから省き、上に飛び出したものは戻るまで描かない
+        limit = np.multiply(start_life, cutoff, out=scratch.get("limit", n))
+        drawn = np.greater_equal(life, limit, out=scratch.get("drawn", n, bool))
+        visible = np.greater(x, VISIBLE_MIN, out=scratch.get("visible", n, bool))
+        test = scratch.get("test", n, bool)
+        visible &= np.less(x, VISIBLE_MAX_X, out=test)
+        visible &= np.greater(y, VISIBLE_MIN, out=test)
+        visible &= np.less(y, VISIBLE_MAX_Y, out=test)
+        visible &= drawn
+        count = int(np.count_nonzero(visible))
+        skipped = int(np.count_nonzero(drawn)) - count
+        # 寿命が減るにつれて元の色から6番、1番の色に変える
+        colors = scratch.get("colors", n, np.uint8)
+        np.copyto(colors, self.color[:n])
+        fading = scratch.get("fading", n, bool)
+        np.multiply(start_life, 2, out=limit)
+        np.copyto(
+            colors, 6, where=np.less(life, np.divide(limit, 3, out=limit), out=fading)
+        )
+        np.copyto(
+            colors,
+            1,
+            where=np.less(life, np.divide(start_life, 3, out=limit), out=fading),
+        )
+        xs = round_points(x, scratch.get("xs", n, np.intp), scratch)
+        ys = round_points(y, scratch.get("ys", n, np.intp), scratch)
+        # 全部について求めてから、描くものだけを取り出す
+        indices = kept_indices(visible, count, scratch)
+        return (
+            np.take(
+                xs, indices, out=scratch.get("visible_xs", count, np.intp), mode="clip"
+            ),
+            np.take(
+                ys, indices, out=scratch.get("visible_ys", count, np.intp), mode="clip"
+            ),
+            np.take(
+                colors,
+                indices,
+                out=scratch.get("visible_colors", count, np.uint8),
+                mode="clip",
+            ),
+            skipped,
+        )
 
-    def draw(self):
-        if self.life < self.start_life / 3:
-            pyxel.pset(self.x, self.y, 1)
-        elif self.life < self.start_life * 2 / 3:
-            pyxel.pset(self.x, self.y, 6)
+
+def round_points(values, out, scratch):
+    """values を round_coord と同じく0.5を0から遠い方へ丸めて out (整数の配列) に入れる"""
+    rounded = np.copysign(0.5, values, out=scratch.get("rounded", len(values)))
+    rounded += values
+    np.trunc(rounded, out=rounded)
+    np.copyto(out, rounded, casting="unsafe")
+    return out
+
+
+BARRIER_COLORS = (10, 11, 12, 5, 9, 8)
+
+
+class ParticlePreset:
+    """爆発の種類ごとの設定と、あらかじめ乱数で作った速度と寿命の表"""
+
+    def __init__(self, count, color, life, speed, size, table_size=512, seed=0):
+        self.count = count
+        self.color = color
+        self.size = size
+        self.table_size = table_size
+        rng = random.Random(seed)
+        vx = []
+        vy = []
+        lives = []
+        for _ in range(table_size):
+            angle = rng.uniform(0, math.pi * 2)
+            velocity = rng.uniform(0, speed)
+            vx.append(math.cos(angle) * velocity)
+            vy.append(math.sin(angle) * velocity)
+            lives.append(life + rng.uniform(0, life * 0.5))
+        # 表の先頭を末尾にも足しておき、どこから読んでも折り返さずに切り出せるようにする
+        self.vx = np.array(vx + vx[:count])
+        self.vy = np.array(vy + vy[:count])
+        self.lives = np.array(lives + lives[:count])
+
+    def spawn(self, particles, x, y, count, offset):
+        """表の offset から count 個分のパーティクルを particles に追加する"""
+        end = offset + count
+        particles.add(
+            x,
+            y,
+            self.vx[offset:end],
+            self.vy[offset:end],
+            self.lives[offset:end],
+            self.color,
+            self.size,
+        )
+
+
+# 爆発ごとのパーティクルの設定
+BARRIER_HIT_BURST = ParticlePreset(count=10, color=12, life=30, speed=2, size=2)
+MISSILE_BURST = ParticlePreset(count=50, color=10, life=60, speed=4, size=3)
+BARRIER_ALIEN_BURST = ParticlePreset(count=30, color=11, life=42, speed=3, size=2)
+MINOR_ALIEN_BURST = ParticlePreset(count=20, color=9, life=30, speed=2.5, size=2)
+PLAYER_BURST = ParticlePreset(count=80, color=8, life=78, speed=5, size=3)
+STATION_BURST = ParticlePreset(count=100, color=5, life=120, speed=6, size=4)
+
+
+# --- 描画バックエンド ---
+# 描画先はpyxelモジュールそのものか、同じ名前の描画関数を持つオブジェクト
+def round_coord(value):
+    """pyxelと同じく0.5を0から遠い方へ丸めて整数座標にする"""
+    if value >= 0:
+        return int(value + 0.5)
+    return -int(0.5 - value)
+
+
+class FramebufferRenderer:
+    """320x240の16色インデックスをNumPy配列に描くヘッドレス用の描画先"""
+
+    glyphs = None  # 文字コードからフォントのマスクへの対応
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width), dtype=np.uint8)
+        if FramebufferRenderer.glyphs is None:
+            FramebufferRenderer.glyphs = self.load_glyphs()
+
+    @staticmethod
+    def load_glyphs():
+        """pyxelの組み込みフォントを画像に描いてマスクとして取り出す"""
+        chars = [chr(code) for code in range(32, 127)]
+        image = pyxel.Image(len(chars) * pyxel.FONT_WIDTH, pyxel.FONT_HEIGHT)
+        image.cls(0)
+        for i, char in enumerate(chars):
+            image.text(i * pyxel.FONT_WIDTH, 0, char, 1)
+        glyphs = {}
+        for i, char in enumerate(chars):
+            mask = np.array(
+                [
+                    [
+                        image.pget(i * pyxel.FONT_WIDTH + x, y) != 0
+                        for x in range(pyxel.FONT_WIDTH)
+                    ]
+                    for y in range(pyxel.FONT_HEIGHT)
+                ]
+            )
+            glyphs[char] = mask
+        return glyphs
+
+    def cls(self, col):
+        self.pixels.fill(col)
+
+    def fill_rect(self, x, y, w, h, col):
+        """整数座標の矩形を画面内に切り詰めて塗る"""
+        x1 = max(x, 0)
+        y1 = max(y, 0)
+        x2 = min(x + w, self.width)
+        y2 = min(y + h, self.height)
+        if x1 < x2 and y1 < y2:
+            self.pixels[y1:y2, x1:x2] = col
+
+    def rect(self, x, y, w, h, col):
+        self.fill_rect(
+            round_coord(x), round_coord(y), round_coord(w), round_coord(h), col
+        )
+
+    def pset(self, x, y, col):
+        x = round_coord(x)
+        y = round_coord(y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pixels[y, x] = col
+
+    def line(self, x1, y1, x2, y2, col):
+        x1, y1, x2, y2 = map(round_coord, (x1, y1, x2, y2))
+        if x1 == x2:
+            self.fill_rect(x1, min(y1, y2), 1, abs(y2 - y1) + 1, col)
+            return
+        if y1 == y2:
+            self.fill_rect(min(x1, x2), y1, abs(x2 - x1) + 1, 1, col)
+            return
+        # pyxelと同じく、長い方の軸で1画素ずつ進めて単精度で求めたずれを丸める
+        if abs(x2 - x1) >= abs(y2 - y1):
+            if x1 > x2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            steps = np.arange(x2 - x1 + 1, dtype=np.float32)
+            offsets = steps * (np.float32(y2 - y1) / np.float32(x2 - x1))
+            xs = x1 + steps.astype(int)
+            ys = y1 + (np.sign(offsets) * np.floor(np.abs(offsets) + 0.5)).astype(int)
         else:
-            pyxel.pset(self.x, self.y, self.color)
+            if y1 > y2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            steps = np.arange(y2 - y1 + 1, dtype=np.float32)
+            offsets = steps * (np.float32(x2 - x1) / np.float32(y2 - y1))
+            xs = x1 + (np.sign(offsets) * np.floor(np.abs(offsets) + 0.5)).astype(int)
+            ys = y1 + steps.astype(int)
+        visible = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.pixels[ys[visible], xs[visible]] = col
+
+    def text(self, x, y, s, col):
+        x = round_coord(x)
+        y = round_coord(y)
+        for char in s:
+            mask = self.glyphs.get(char)
+            if mask is not None:
+                self.blit_mask(x, y, mask, col)
+            x += pyxel.FONT_WIDTH
+
+    def points(self, xs, ys, cols):
+        """画面内の整数座標の点をまとめて打つ (後の点が上に重なる)"""
+        self.pixels[ys, xs] = cols
+
+    def blit_mask(self, x, y, mask, col):
+        h, w = mask.shape
+        x1 = max(x, 0)
+        y1 = max(y, 0)
+        x2 = min(x + w, self.width)
+        y2 = min(y + h, self.height)
+        if x1 < x2 and y1 < y2:
+            region = self.pixels[y1:y2, x1:x2]
+            region[mask[y1 - y : y2 - y, x1 - x : x2 - x]] = col
+
+    def frame_hash(self):
+        """ゴールデンイメージとの比較に使うフレームのハッシュ"""
+        return hashlib.blake2b(self.pixels.tobytes(), digest_size=16).hexdigest()
+
+
+# 描画命令の種類
+OP_CLS = 0
+OP_RECT = 1
+OP_PSET = 2
+OP_LINE = 3  # w, h の位置に終点の座標を入れる
+OP_TEXT = 4  # w の位置に文字列の番号を入れる
+
+# App.command_stats の並び (記録した数, 送った数, 前フレームと同じ数)
+RENDER_COMMAND_NAMES = ("recorded", "sent", "repeated")
+
+
+class CommandBuffer:
+    """描画命令を (命令, x, y, w, h, 色) の整数の並びとして記録する描画先
+
+    記録した命令は並べ替え・結合してから、任意の描画先に再生できる。
+    """
+
+    RECORD_SIZE = 6
 
+    def __init__(self):
+        self.commands = array("i")
+        self.texts = []
+        self.previous = array("i")  # 前のフレームの命令 (差分を数える用)
+
+    def __len__(self):
+        return len(self.commands) // self.RECORD_SIZE
+
+    def begin_frame(self):
+        self.previous, self.commands = self.commands, self.previous
+        del self.commands[:]
+        self.texts.clear()
+
+    def cls(self, col):
+        self.commands.extend((OP_CLS, 0, 0, 0, 0, col))
+
+    def rect(self, x, y, w, h, col):
+        self.commands.extend(
+            (
+                OP_RECT,
+                round_coord(x),
+                round_coord(y),
+                round_coord(w),
+                round_coord(h),
+                col,
+            )
+        )
+
+    def pset(self, x, y, col):
+        self.commands.extend((OP_PSET, round_coord(x), round_coord(y), 1, 1, col))
+
+    def points(self, xs, ys, cols):
+        for x, y, col in zip(xs.tolist(), ys.tolist(), cols.tolist()):
+            self.commands.extend((OP_PSET, x, y, 1, 1, col))
+
+    def line(self, x1, y1, x2, y2, col):
+        self.commands.extend(
+            (
+                OP_LINE,
+                round_coord(x1),
+                round_coord(y1),
+                round_coord(x2),
+                round_coord(y2),
+                col,
+            )
+        )
+
+    def text(self, x, y, s, col):
+        self.commands.extend(
+            (OP_TEXT, round_coord(x), round_coord(y), len(self.texts), 0, col)
+        )
+        self.texts.append(s)
+
+    def records(self, commands=None):
+        """記録した命令を6要素のタプルで順に返す"""
+        values = iter(self.commands if commands is None else commands)
+        return zip(values, values, values, values, values, values)
+
+    def count_redundant(self):
+        """前のフレームとまったく同じ命令の数を返す"""
+        if not self.previous:
+            return 0
+        common = Counter(self.records()) & Counter(self.records(self.previous))
+        return sum(common.values())
+
+    def optimized(self):
+        """結果を変えずに命令をまとめた新しいバッファを返す
+
+        連続するpsetは色ごとに横に並んだ点を矩形にまとめ、
+        連続する矩形 (縦線を含む) は同じ高さ・色で隣り合うものを1つにする。
+        """
+        result = CommandBuffer()
+        result.texts = self.texts
+        points = {}
+        for record in self.records():
+            op = record[0]
+            if op == OP_PSET:
+                # 同じ点に複数回打つ場合は最後の色だけが残る
+                points[record[1], record[2]] = record[5]
+                continue
+            if points:
+                result.add_points(points)
+                points = {}
+            if op == OP_LINE and record[1] == record[3]:
+                _, x, y1, _, y2, col = record
+                op, record = OP_RECT, (
+                    OP_RECT,
+                    x,
+                    min(y1, y2),
+                    1,
+                    abs(y2 - y1) + 1,
+                    col,
+                )
+            if op == OP_RECT:
+                result.add_rect(record)
+            else:
+                result.commands.extend(record)
+        if points:
+            result.add_points(points)
+        return result
+
+    def add_rect(self, record):
+        _, x, y, w, h, col = record
+        if w <= 0 or h <= 0:
+            return
+        commands = self.commands
+        if len(commands) >= self.RECORD_SIZE:
+            last = commands[-self.RECORD_SIZE :]
+            if (
+                last[0] == OP_RECT
+                and last[2] == y
+                and last[4] == h
+                and last[5] == col
+                and last[1] + last[3] == x
+            ):
+                commands[-3] += w
+                return
+        commands.extend(record)
+
+    def add_points(self, points):
+        by_color = {}
+        for (x, y), col in points.items():
+            by_color.setdefault(col, []).append((y, x))
+        for col, pixels in by_color.items():
+            pixels.sort()
+            start_y, start_x = pixels[0]
+            length = 1
+            for y, x in pixels[1:]:
+                if y == start_y and x == start_x + length:
+                    length += 1
+                    continue
+                self.add_run(start_x, start_y, length, col)
+                start_y, start_x, length = y, x, 1
+            self.add_run(start_x, start_y, length, col)
+
+    def add_run(self, x, y, length, col):
+        if length == 1:
+            self.commands.extend((OP_PSET, x, y, 1, 1, col))
+        else:
+            self.commands.extend((OP_RECT, x, y, length, 1, col))
+
+    def replay(self, gfx):
+        """記録した命令を別の描画先で実行する"""
+        for op, x, y, w, h, col in self.records():
+            if op == OP_RECT:
+                gfx.rect(x, y, w, h, col)
+            elif op == OP_PSET:
+                gfx.pset(x, y, col)
+            elif op == OP_TEXT:
+                gfx.text(x, y, self.texts[w], col)
+            elif op == OP_LINE:
+                gfx.line(x, y, w, h, col)
+            elif op == OP_CLS:
+                gfx.cls(col)
+
+
+class PointLayer:
+    """点をオフスクリーンの画像にまとめて書き込み、1回のbltで画面に重ねる"""
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.width = width
+        self.height = height
+        self.image = pyxel.Image(width, height)
+        self.image.cls(0)
+        # 画像のメモリをそのままNumPyの配列として書き換える
+        self.pixels = np.ctypeslib.as_array(self.image.data_ptr()).reshape(
+            height, width
+        )
+
+    def draw(self, xs, ys, cols, target=pyxel):
+        """0番の色を透明色にして、点のある範囲だけ target (pyxelか画像) に重ねる"""
+        if not len(xs):
+            return
+        x1 = int(xs.min())
+        y1 = int(ys.min())
+        self.pixels[ys, xs] = cols
+        target.blt(
+            x1,
+            y1,
+            self.image,
+            x1,
+            y1,
+            int(xs.max()) + 1 - x1,
+            int(ys.max()) + 1 - y1,
+            0,
+        )
+        # 次のフレームに備えて、書いた点だけを透明に戻す
+        self.pixels[ys, xs] = 0
+
+
+# --- 乱数 ---
+RANDOM_BLOCK_SIZE = 64
+MASK64 = (1 << 64) - 1
+
+
+class RandomStream:
+    """NumPyでまとめて作った一様乱数を1つずつ返す、処理ごとに独立した乱数列"""
+
+    def __init__(self, seed_sequence, block_size=RANDOM_BLOCK_SIZE):
+        self.generator = np.random.Generator(np.random.PCG64(seed_sequence))
+        self.block_size = block_size
+        self.block = np.empty(block_size)
+        self.refill()
+
+    def refill(self):
+        # 作る前の状態を覚えておけば、セーブステートから同じブロックを作り直せる
+        self.block_state = self.generator.bit_generator.state
+        # ブロックごとに配列やリストを作らず、同じ配列に上書きする
+        self.generator.random(out=self.block)
+        self.position = 0
+
+    def random(self):
+        if self.position == self.block_size:
+            self.refill()
+        value = self.block.item(self.position)
+        self.position += 1
+        return value
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def randrange(self, stop):
+        return int(self.random() * stop)
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def pack(self):
+        state = self.block_state["state"]
+        return RANDOM_STREAM_STATE.pack(
+            state["state"] & MASK64,
+            state["state"] >> 64,
+            state["inc"] & MASK64,
+            state["inc"] >> 64,
+            self.block_state["has_uint32"],
+            self.block_state["uinteger"],
+            self.position,
+        )
+
+    def unpack_from(self, data, offset):
+        (
+            state_low,
+            state_high,
+            inc_low,
+            inc_high,
+            has_uint32,
+            uinteger,
+            position,
+        ) = RANDOM_STREAM_STATE.unpack_from(data, offset)
+        self.generator.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {
+                "state": state_low | state_high << 64,
+                "inc": inc_low | inc_high << 64,
+            },
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+        self.refill()
+        self.position = position
+
+
+def create_random_streams(seed=None):
+    """パーティクル, バリアエイリアン, 攻撃する敵, デモのAIの乱数列を作る"""
+    return tuple(RandomStream(child) for child in np.random.SeedSequence(seed).spawn(4))
+
+
+# --- セーブステート ---
+SAVE_STATE_MAGIC = b"BAS2"
+# マジック, 状態, フレーム数, 各種タイマー, デモ用の値, 敵の数の設定
+SAVE_HEADER = struct.Struct("<4sBIiiiBiddbdii??HHH")
+STATION_STATE = struct.Struct("<?")
+# ミサイル, バリアエイリアン, 小さい敵, 弾, パーティクルの数
+ENTITY_COUNTS = struct.Struct("<HHHHI")
+
+
+class EntityStateFormats:
+    """エンティティの位置と速度を number の型で詰める形式 (浮動小数点か固定小数点か)"""
+
+    def __init__(self, magic, number, bullet_type):
+        self.magic = magic
+        n = number
+        self.player = struct.Struct(f"<{n}{n}?ii")
+        self.missile = struct.Struct(f"<{n}{n}{n}?i")
+        self.barrier_alien = struct.Struct(f"<{n}{n}{n}b?")
+        self.minor_alien = struct.Struct(f"<H{n}{n}?{n}{n}")
+        self.falling_alien = struct.Struct(f"<H{n}{n}{n}{n}")
+        self.bullet = np.dtype([("x", bullet_type), ("y", bullet_type)])
+
+
+FLOAT_STATE_FORMATS = EntityStateFormats(SAVE_STATE_MAGIC, "d", "<f8")
+FIXED_STATE_FORMATS = EntityStateFormats(b"BAX2", "i", "<i4")
+# PCG64の状態 (128ビットを2つに分ける), ブロック内の位置
+RANDOM_STREAM_STATE = struct.Struct("<QQQQ?IH")
+# パーティクルは見た目だけなので単精度で詰める
+PARTICLE_STATE = np.dtype(
+    [
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("vx", "<f4"),
+        ("vy", "<f4"),
+        ("life", "<f4"),
+        ("start_life", "<f4"),
+        ("color", "u1"),
+        ("size", "u1"),
+    ]
+)
+# ミサイル, バリアエイリアン, 隊列の敵, 落下中の敵, 弾の数
+STATE_HASH_COUNTS = struct.Struct("<HHHHH")
+
+
+class StateHasher:
+    """ゲームの進行に関わる状態 (パーティクル以外) を詰めて、フレームごとのハッシュを作る
+
+    ヘッダーと自機は使い回すバッファに書き、弾と隊列の敵は配列をそのまま渡す。
+    """
+
+    def __init__(self, formats=FLOAT_STATE_FORMATS):
+        self.formats = formats
+        self.buffer = bytearray(
+            SAVE_HEADER.size
+            + formats.player.size
+            + STATION_STATE.size
+            + STATE_HASH_COUNTS.size
+        )
+
+    def hash(self, app):
+        buffer = self.buffer
+        formats = self.formats
+        player = app.player
+        minor_aliens = app.minor_aliens
+        bullets = app.bullets
+        SAVE_HEADER.pack_into(buffer, 0, *app.header_values())
+        offset = SAVE_HEADER.size
+        formats.player.pack_into(
+            buffer,
+            offset,
+            player.x,
+            player.y,
+            player.is_alive,
+            player.respawn_timer,
+            player.invincibility_timer,
+        )
+        offset += formats.player.size
+        STATION_STATE.pack_into(buffer, offset, app.station.is_alive)
+        offset += STATION_STATE.size
+        STATE_HASH_COUNTS.pack_into(
+            buffer,
+            offset,
+            len(app.large_missiles),
+            len(app.barrier_aliens),
+            len(minor_aliens.idle),
+            len(minor_aliens.falling),
+            bullets.count,
+        )
+        crc = zlib.crc32(buffer)
+        crc = zlib.crc32(bullets.x[: bullets.count], crc)
+        crc = zlib.crc32(bullets.y[: bullets.count], crc)
+        crc = zlib.crc32(minor_aliens.idle_boxes[: len(minor_aliens.idle)], crc)
+        # 数の少ないものだけ1つずつ詰める
+        for alien in minor_aliens.falling:
+            crc = zlib.crc32(
+                formats.falling_alien.pack(
+                    alien.original_index,
+                    alien.x,
+                    alien.y,
+                    alien.fall_speed_x,
+                    alien.fall_speed_y,
+                ),
+                crc,
+            )
+        for m in app.large_missiles:
+            crc = zlib.crc32(
+                formats.missile.pack(m.x, m.y, m.speed, m.is_alive, m.respawn_timer),
+                crc,
+            )
+        for a in app.barrier_aliens:
+            crc = zlib.crc32(
+                formats.barrier_alien.pack(a.x, a.y, a.speed, a.direction, a.is_alive),
+                crc,
+            )
+        return crc
+
+
+# --- 巻き戻し ---
+def xor_bytes(data, base):
+    """2つのバイト列のXORを長い方の長さで返す (短い方は0で埋める)"""
+    length = max(len(data), len(base))
+    value = int.from_bytes(data, "little") ^ int.from_bytes(base, "little")
+    return value.to_bytes(length, "little")
+
+
+class RewindBuffer:
+    """直近数秒のセーブステートを、キーフレームとの差分で圧縮して保持するリングバッファ"""
+
+    def __init__(self, seconds=10, fps=60, keyframe_interval=60):
+        self.capacity = seconds * fps
+        self.keyframe_interval = keyframe_interval
+        # (フレーム番号, 圧縮したデータ, 元の長さ) をフレーム番号の剰余の位置に置く
+        self.slots = [None] * self.capacity
+        self.next_frame = 0
+        self.written_frame = -1  # これまでに書き込んだ最大のフレーム番号
+        self.keyframe = b""  # 差分の基準にしている直近のキーフレーム
+        self.cached_keyframe = (-1, b"")  # 巻き戻し中に展開したキーフレーム
+        self.restore_times = []
+
+    def record(self, state):
+        number = self.next_frame
+        if number % self.keyframe_interval == 0:
+            self.keyframe = state
+            data = zlib.compress(state, 1)
+        else:
+            # 同じ位置のバイトはほとんど変わらないので、XORするとほぼ0になる
+            data = zlib.compress(xor_bytes(state, self.keyframe), 1)
+        self.slots[number % self.capacity] = (number, data, len(state))
+        self.next_frame += 1
+        self.written_frame = max(self.written_frame, number)
+
+    def oldest_frame(self):
+        """キーフレームが残っていて復元できる一番古いフレーム番号"""
+        # 巻き戻して捨てたフレームも、上書きされるまでは古い枠を占めている
+        first = max(0, self.written_frame + 1 - self.capacity)
+        interval = self.keyframe_interval
+        return (first + interval - 1) // interval * interval
+
+    def newest_frame(self):
+        return self.next_frame - 1
+
+    def load_keyframe(self, number):
+        if self.cached_keyframe[0] != number:
+            _, data, _ = self.slots[number % self.capacity]
+            self.cached_keyframe = (number, zlib.decompress(data))
+        return self.cached_keyframe[1]
+
+    def restore(self, number):
+        """指定したフレームのセーブステートを返す"""
+        if not self.oldest_frame() <= number <= self.newest_frame():
+            raise IndexError(f"フレーム{number}は保持していません")
+        start = time.perf_counter()
+        keyframe_number = number - number % self.keyframe_interval
+        keyframe = self.load_keyframe(keyframe_number)
+        if number == keyframe_number:
+            state = keyframe
+        else:
+            _, data, length = self.slots[number % self.capacity]
+            state = xor_bytes(zlib.decompress(data), keyframe)[:length]
+        self.restore_times.append(time.perf_counter() - start)
+        return state
+
+    def truncate(self, number):
+        """指定したフレームより後を捨て、そこから記録を再開する"""
+        self.next_frame = number + 1
+        self.keyframe = self.load_keyframe(number - number % self.keyframe_interval)
+
+    def memory_usage(self):
+        total = len(self.keyframe)
+        for slot in self.slots:
+            if slot:
+                total += len(slot[1])
+        return total
+
+    def report(self):
+        restore_ms = sorted(t * 1000 for t in self.restore_times)
+        stored = min(self.next_frame, self.capacity)
+        return (
+            f"rewind: {stored} frames, {self.memory_usage() / 1024:.1f} KB,"
+            f" restore avg {sum(restore_ms) / max(1, len(restore_ms)):.3f} ms"
+            f" p99 {percentile(restore_ms, 0.99):.3f} ms"
+        )
+
+
+# --- シミュレーションの速さ ---
+GAME_TICK_HZ = 60  # ゲームの速さや時間はこの頻度のフレーム数で決めてある
+MIN_SIM_HZ = 30  # これより遅くすると1回で進む弾がバリアの判定の幅を飛び越える
+INTERPOLATION_SNAP_DISTANCE = 16  # 1回でこれ以上動いたものは補間しない (ピクセル)
+
+
+def simulation_rates(fps, sim_hz=None):
+    """表示と計算の頻度から (計算の頻度, 1回で進めるフレーム数) を返す
+
+    1フレームに2回以上は進めないので、計算の頻度は表示の fps 以下にする。
+    省略したときは、そのうちで一番速いものを選ぶ。
+    """
+    rates = [hz for hz in range(MIN_SIM_HZ, GAME_TICK_HZ + 1) if GAME_TICK_HZ % hz == 0]
+    if sim_hz is None:
+        sim_hz = max((hz for hz in rates if hz <= fps), default=MIN_SIM_HZ)
+    if sim_hz not in rates or sim_hz > fps:
+        raise ValueError(
+            f"計算の頻度 {sim_hz}Hz は {MIN_SIM_HZ}Hz 以上で {GAME_TICK_HZ} を割り切れ、"
+            f"表示の {fps}fps 以下の値にしてください"
+        )
+    return sim_hz, GAME_TICK_HZ // sim_hz
+
+
+def interpolate_entities(entities, alpha, limit):
+    """prev_x, prev_y から今の位置までの alpha の割合の位置に動かす
+
+    一度に limit 以上動いたもの (出現し直したものなど) は補間せずに今の位置のままにする。
+    """
+    back = 1 - alpha
+    for entity in entities:
+        dx = entity.x - entity.prev_x
+        dy = entity.y - entity.prev_y
+        if abs(dx) < limit and abs(dy) < limit:
+            entity.x -= dx * back
+            entity.y -= dy * back
+
+
+# --- 描画用スナップショット ---
+def clone_entity(entity):
+    """エンティティの属性をそのまま写した複製を作る"""
+    clone = object.__new__(type(entity))
+    clone.__dict__.update(entity.__dict__)
+    return clone
+
+
+class WorldSnapshot:
+    """描画に必要なワールドの状態を写し取った読み取り専用のスナップショット"""
+
+    __slots__ = (
+        "game_state",
+        "frame_count",
+        "demo_phase",
+        "demo_walker_x",
+        "demo_title_reveal_x",
+        "score",
+        "lives",
+        "is_barrier_disabled",
+        "player",
+        "station",
+        "large_missiles",
+        "barrier_aliens",
+        "minor_aliens",
+        "bullets",
+        "particles",
+        "barrier_time",
+    )
+
+    def __init__(self, app, alpha=1):
+        self.game_state = app.game_state
+        self.frame_count = app.frame_count
+        self.demo_phase = app.demo_phase
+        self.demo_walker_x = app.demo_walker_x
+        self.demo_title_reveal_x = app.demo_title_reveal_x
+        self.score = app.score
+        self.lives = app.lives
+        self.is_barrier_disabled = app.is_barrier_disabled
+        self.player = clone_entity(app.player)
+        self.station = clone_entity(app.station)
+        self.large_missiles = tuple(map(clone_entity, app.large_missiles))
+        self.barrier_aliens = tuple(map(clone_entity, app.barrier_aliens))
+        self.minor_aliens = tuple(map(clone_entity, app.minor_aliens))
+        self.particles = app.particles.copy()
+        self.barrier_time = app.frame_count
+        if alpha < 1:
+            self.interpolate(app, alpha)
+        if app.unit == 1:
+            self.bullets = app.bullets.copy()
+        else:
+            # 固定小数点モードでは描画用にピクセル単位へ直す
+            self.bullets = app.bullets.to_pixels(app.unit)
+            for entity in (
+                self.player,
+                self.station,
+                *self.large_missiles,
+                *self.barrier_aliens,
+                *self.minor_aliens,
+            ):
+                entity.x /= app.unit
+                entity.y /= app.unit
+                entity.w /= app.unit
+                entity.h /= app.unit
+        if alpha < 1:
+            # 弾はどれも同じ速さで上に進むので、進んだ分だけ下に戻して描く
+            bullets = self.bullets
+            bullets.y[: bullets.count] += BULLET_SPEED * app.tick * (1 - alpha)
+
+    def interpolate(self, app, alpha):
+        """直前のシミュレーションの状態から alpha の割合だけ進んだ位置にする"""
+        back = 1 - alpha
+        self.barrier_time -= app.tick * back
+        self.demo_walker_x -= (app.demo_walker_x - app.prev_demo_walker_x) * back
+        interpolate_entities(
+            (
+                self.player,
+                *self.large_missiles,
+                *self.barrier_aliens,
+                *self.minor_aliens,
+            ),
+            alpha,
+            INTERPOLATION_SNAP_DISTANCE * app.unit,
+        )
+
+
+class SnapshotBuffer:
+    """シミュレーション側が裏面に書き込み、描画側が表面を読む2面バッファ"""
+
+    def __init__(self, snapshot):
+        self.slots = [snapshot, snapshot]
+        self.front = 0
+        self.lock = threading.Lock()
+
+    def publish(self, snapshot):
+        back = 1 - self.front
+        self.slots[back] = snapshot
+        with self.lock:
+            self.front = back
+
+    def latest(self):
+        with self.lock:
+            return self.slots[self.front]
+
+
+class SimulationWorker:
+    """別スレッドで1ティックずつシミュレーションを進め、結果を公開する"""
+
+    def __init__(self, app):
+        self.app = app
+        self.snapshots = SnapshotBuffer(WorldSnapshot(app))
+        self.step_time = 0
+        self.stepped = False  # 進めた結果をメインスレッドでまだ受け取っていない
+        self.error = None
+        self.requested = threading.Event()
+        self.finished = threading.Event()
+        self.finished.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.requested.wait()
+            self.requested.clear()
+            try:
+                start = time.perf_counter()
+                self.app.advance()
+                self.app.finish_step()
+                self.snapshots.publish(WorldSnapshot(self.app))
+                self.step_time = time.perf_counter() - start
+            except Exception as e:
+                self.error = e
+            self.finished.set()
+
+    def start_step(self):
+        self.stepped = True
+        self.finished.clear()
+        self.requested.set()
+
+    def wait(self):
+        """実行中のティックが終わるまで待つ"""
+        self.finished.wait()
+        if self.error:
+            raise self.error
+
+
+# --- 計測ツール ---
+def percentile(sorted_values, ratio):
+    """昇順に並んだ値からパーセンタイル値を返す"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * ratio))
+    return sorted_values[index]
+
+
+# (小さい敵の数, バリアエイリアンの数, 大型ミサイルの数)
+STRESS_SCALES = [
+    (16, 1, 1),
+    (64, 2, 2),
+    (256, 4, 4),
+    (1024, 8, 8),
+    (2048, 12, 12),
+    (4096, 16, 16),
+]
+
+
+class StressTest:
+    """エンティティ数を段階的に増やし、各段階のフレーム時間を計測する"""
+
+    def __init__(self, scales=STRESS_SCALES, warmup_frames=60, sample_frames=300):
+        self.scales = scales
+        self.warmup_frames = warmup_frames
+        self.sample_frames = sample_frames
+        self.scale_index = 0
+        self.results = []
+        self.reset_samples()
+
+    def reset_samples(self):
+        self.frame = 0
+        self.frame_times = []
+        self.enemies_times = []
+        self.collisions_times = []
+        self.first_sample_time = 0
+        self.first_cull_counts = (0, 0)
+
+    def apply_scale(self, app):
+        minor, barrier, missiles = self.scales[self.scale_index]
+        app.minor_alien_count = minor
+        app.barrier_alien_count = barrier
+        app.large_missile_count = missiles
+        app.auto_fire_interval = 4
+        app.start_autoplay_demo()
+        # 計測中にデモが終わらないようにする (ターボでは1フレームに何回も進む)
+        app.state_timer = (
+            self.warmup_frames + self.sample_frames
+        ) * app.turbo_steps * app.tick + 1
+        self.reset_samples()
+        app.gc_scheduler.reset_stats()
+
+    def on_update(self, app):
+        self.frame += 1
+        if self.frame <= self.warmup_frames:
+            self.first_sample_time = time.perf_counter()
+            app.gc_scheduler.reset_stats()
+            self.first_cull_counts = (
+                app.particle_updates_saved,
+                app.particle_draws_skipped,
+            )
+            return
+        self.frame_times.append(app.update_time + app.draw_time)
+        self.enemies_times.append(app.enemies_time)
+        self.collisions_times.append(app.collisions_time)
+        if len(self.frame_times) < self.sample_frames:
+            return
+
+        elapsed = time.perf_counter() - self.first_sample_time
+        result = self.summarize(app, elapsed)
+        self.results.append(result)
+        if len(self.results) == 1:
+            print(
+                "minor barrier missiles |    fps | frame ms p50   p95   p99"
+                " | enemies p99 | collisions p99 | gc ms p99   max"
+                " | culled upd/f draw/f | 60fps"
+            )
+        print(
+            "{minor:5d} {barrier:7d} {missiles:8d} | {fps:6.1f} |"
+            " {p50:13.2f} {p95:5.2f} {p99:5.2f} | {enemies_p99:11.2f} |"
+            " {collisions_p99:14.2f} | {gc_p99:10.2f} {gc_max:5.2f} |"
+            " {culled_updates:12.1f} {skipped_draws:6.1f} | {verdict}".format(**result)
+        )
+
+        self.scale_index += 1
+        if self.scale_index < len(self.scales):
+            self.apply_scale(app)
+        else:
+            pyxel.quit()
+
+    def summarize(self, app, elapsed):
+        minor, barrier, missiles = self.scales[self.scale_index]
+        frame_ms = sorted(t * 1000 for t in self.frame_times)
+        enemies_ms = sorted(t * 1000 for t in self.enemies_times)
+        collisions_ms = sorted(t * 1000 for t in self.collisions_times)
+        p99 = percentile(frame_ms, 0.99)
+        return {
+            "minor": minor,
+            "barrier": barrier,
+            "missiles": missiles,
+            "fps": len(frame_ms) / elapsed if elapsed > 0 else 0,
+            "p50": percentile(frame_ms, 0.5),
+            "p95": percentile(frame_ms, 0.95),
+            "p99": p99,
+            "enemies_p99": percentile(enemies_ms, 0.99),
+            "collisions_p99": percentile(collisions_ms, 0.99),
+            "gc_p99": app.gc_scheduler.pause_percentile(0.99) * 1000,
+            "gc_max": app.gc_scheduler.pause_percentile(1) * 1000,
+            "culled_updates": (app.particle_updates_saved - self.first_cull_counts[0])
+            / len(frame_ms),
+            "skipped_draws": (app.particle_draws_skipped - self.first_cull_counts[1])
+            / len(frame_ms),
+            "verdict": "OK" if p99 <= 1000 / 60 else "NG",
+        }
+
+
+# 品質レベルごとの設定
+# (パーティクル数の倍率, バリアの描画間隔, 描画を省くパーティクルの残り寿命比率)
+QUALITY_LEVELS = [
+    (1.0, 1, 0),
+    (0.6, 2, 1 / 3),
+    (0.35, 3, 1 / 2),
+    (0.2, 4, 2 / 3),
+]
+
+
+class QualityGovernor:
+    """フレーム時間の移動平均を見て描画品質を上げ下げする"""
+
+    def __init__(
+        self,
+        target_time=1 / 60,
+        window=30,
+        degrade_ratio=0.9,
+        recover_ratio=0.6,
+        recover_frames=120,
+    ):
+        self.enabled = True
+        self.target_time = target_time
+        self.degrade_ratio = degrade_ratio  # 平均がこれを超えたら品質を下げる
+        self.recover_ratio = recover_ratio  # 平均がこれを下回り続けたら戻す
+        self.recover_frames = recover_frames
+        self.samples = [0] * window
+        self.sample_index = 0
+        self.total_time = 0
+        self.level = 0
+        self.cooldown = 0
+        self.calm_frames = 0
+        self.apply_level()
+
+    def apply_level(self):
+        (
+            self.particle_scale,
+            self.barrier_stride,
+            self.particle_cutoff,
+        ) = QUALITY_LEVELS[self.level]
+
+    def record(self, frame_time):
+        if not self.enabled:
+            return
+        self.total_time += frame_time - self.samples[self.sample_index]
+        self.samples[self.sample_index] = frame_time
+        self.sample_index = (self.sample_index + 1) % len(self.samples)
+        average = self.total_time / len(self.samples)
+
+        # レベル変更直後は新しいレベルの計測値が溜まるまで待つ
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+
+        if average > self.target_time * self.degrade_ratio:
+            self.calm_frames = 0
+            if self.level < len(QUALITY_LEVELS) - 1:
+                self.change_level(self.level + 1)
+        elif average < self.target_time * self.recover_ratio and self.level > 0:
+            self.calm_frames += 1
+            if self.calm_frames >= self.recover_frames:
+                self.change_level(self.level - 1)
+        else:
+            self.calm_frames = 0
+
+    def change_level(self, level):
+        self.level = level
+        self.cooldown = len(self.samples)
+        self.calm_frames = 0
+        self.apply_level()
+
+
+class GcScheduler:
+    """自動GCを止め、フレームの余り時間や落ち着いた場面で世代ごとに回収する"""
+
+    def __init__(self, target_time=1 / 60, overdue_ratio=4, pause_samples=1024):
+        self.enabled = True
+        self.active = False
+        self.target_time = target_time
+        # しきい値のこの倍を超えたら余裕がなくても回収する
+        self.overdue_ratio = overdue_ratio
+        self.thresholds = gc.get_threshold()
+        self.was_enabled = True
+        self.is_calm = False
+        self.pause_start = 0
+        self.pause_times = deque(maxlen=pause_samples)  # GCで止まった時間 (秒)
+        self.collections = [0, 0, 0]  # 世代ごとの回収回数
+        self.estimates = [0.0005, 0.002, 0.01]  # 世代ごとの停止時間の見積もり (秒)
+
+    def start(self):
+        """停止時間の記録を始める (無効なときは自動GCのまま記録だけする)"""
+        if self.active:
+            return
+        self.was_enabled = gc.isenabled()
+        if self.enabled:
+            gc.disable()
+        gc.callbacks.append(self.on_gc)
+        self.active = True
+
+    def stop(self):
+        if not self.active:
+            return
+        gc.callbacks.remove(self.on_gc)
+        if self.was_enabled:
+            gc.enable()
+        self.active = False
+
+    def on_gc(self, phase, info):
+        """GCの開始と終了で呼ばれ、停止時間を記録する"""
+        if phase == "start":
+            self.pause_start = time.perf_counter()
+            return
+        pause = time.perf_counter() - self.pause_start
+        generation = info["generation"]
+        self.pause_times.append(pause)
+        self.collections[generation] += 1
+        # 長くなったときはすぐ合わせ、短くなったときはゆっくり下げる
+        estimate = self.estimates[generation]
+        if pause > estimate:
+            self.estimates[generation] = pause
+        else:
+            self.estimates[generation] = estimate + (pause - estimate) / 8
+
+    def pending_generation(self, counts):
+        """CPythonと同じ基準で回収が必要な一番古い世代を返す (なければ-1)"""
+        for generation in (2, 1, 0):
+            if counts[generation] >= self.thresholds[generation]:
+                return generation
+        return -1
+
+    def on_frame_end(self, frame_time, is_calm):
+        """update/drawの後に呼び、余り時間に収まる回収だけを行う"""
+        if not self.active or not self.enabled:
+            return
+        if is_calm and not self.is_calm:
+            # 落ち着いた場面に入ったら古い世代までまとめて回収しておく
+            self.is_calm = True
+            gc.collect()
+            return
+        self.is_calm = is_calm
+
+        counts = gc.get_count()
+        generation = self.pending_generation(counts)
+        if generation < 0:
+            return
+        if is_calm or self.estimates[generation] <= self.target_time - frame_time:
+            gc.collect(generation)
+        elif generation > 0 and self.estimates[0] <= self.target_time - frame_time:
+            # 古い世代は次の機会に回し、若い世代だけ片付ける
+            if counts[0] >= self.thresholds[0]:
+                gc.collect(0)
+        elif counts[generation] >= self.thresholds[generation] * self.overdue_ratio:
+            # 溜めすぎるとメモリが増え続けるので、余裕がなくても回収する
+            gc.collect(generation)
+
+    def reset_stats(self):
+        self.pause_times.clear()
+        self.collections = [0, 0, 0]
+
+    def pause_percentile(self, ratio):
+        return percentile(sorted(self.pause_times), ratio)
+
+
+class FrameHistogram:
+    """HDR Histogram風に、2のべき乗の区間ごとに等分したバケットで時間を数える"""
+
+    def __init__(self, sub_bucket_bits=5, max_exponent=20):
+        # マイクロ秒単位で、どの区間でも誤差が1/32以内に収まる
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.max_value = (2 * self.sub_bucket_count << max_exponent) - 1
+        self.counts = [0] * ((max_exponent + 2) * self.sub_bucket_count)
+        self.total = 0
+
+    def bucket_index(self, value):
+        exponent = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return exponent * self.sub_bucket_count + (value >> exponent)
+
+    def bucket_value(self, index):
+        """バケットに入る最小の値を返す"""
+        exponent = max(0, index // self.sub_bucket_count - 1)
+        return (index - exponent * self.sub_bucket_count) << exponent
+
+    def record(self, seconds):
+        value = min(self.max_value, int(seconds * 1000000))
+        self.counts[self.bucket_index(value)] += 1
+        self.total += 1
+
+    def percentile(self, ratio):
+        """パーセンタイル値をマイクロ秒で返す"""
+        if not self.total:
+            return 0
+        rank = min(self.total, int(self.total * ratio) + 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.max_value
+
+    def to_dict(self):
+        """値が入っているバケットだけを {下限値: 回数} で返す"""
+        return {
+            self.bucket_value(index): count
+            for index, count in enumerate(self.counts)
+            if count
+        }
+
+
+class ThroughputMeter:
+    """進めたフレーム数とフレーム時間を数え、終了時に機械で読める形で報告する"""
 
-class App:
     def __init__(self):
-        # 解像度を320x240に変更
-        pyxel.init(320, 240, title="Barrier Attack", fps=60)
+        self.start = time.perf_counter()
+        self.frames = 0
+        self.total_time = 0
+        self.histogram = FrameHistogram()
+
+    def record(self, frame_time):
+        self.frames += 1
+        self.total_time += frame_time
+        self.histogram.record(frame_time)
+
+    def result(self):
+        elapsed = time.perf_counter() - self.start
+        return {
+            "frames": self.frames,
+            "seconds": round(elapsed, 3),
+            "frames_per_second": round(self.frames / elapsed, 1) if elapsed else 0,
+            "frame_ms_mean": round(self.total_time / max(1, self.frames) * 1000, 4),
+            "frame_ms_p99": self.histogram.percentile(0.99) / 1000,
+        }
+
+
+GAME_STATE_NAMES = {
+    GameState.TITLE_DEMO: "title_demo",
+    GameState.AUTO_PLAY_DEMO: "auto_play_demo",
+    GameState.PLAYING: "playing",
+    GameState.GAME_OVER: "game_over",
+}
+
+
+class FrameLogger:
+    """状態ごとのフレーム時間の分布と予算超過フレームをJSONLに追記する"""
+
+    def __init__(
+        self, path, target_time=1 / 60, flush_interval=60, histogram_interval=3600
+    ):
+        self.path = path
+        self.target_time = target_time
+        self.flush_interval = flush_interval  # このフレーム数ごとにまとめて書き出す
+        self.histogram_interval = histogram_interval
+        self.histograms = {
+            state: (FrameHistogram(), FrameHistogram()) for state in GAME_STATE_NAMES
+        }
+        self.frames = 0
+        self.hitch_count = 0
+        self.collision_counts = ()
+        self.command_stats = (0, 0, 0)
+        self.state_hashes = []  # 書き出していないフレームの状態のハッシュ
+        self.first_hashed_frame = 0
+        self.pending = []
+        self.closed_frames = 0  # 最後に close したときのフレーム数
+        # 書き込みは別スレッドで行い、フレームを待たせない
+        self.batches = queue.Queue()
+        self.writer = None
+
+    def write_batches(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            try:
+                with open(self.path, "a") as fout:
+                    fout.writelines(json.dumps(record) + "\n" for record in batch)
+            except OSError as e:
+                print(f"フレームログ '{self.path}' に書き込めませんでした: {e}")
+
+    def record_state_hash(self, frame, state_hash):
+        """進めるたびに、進めた直後の状態のハッシュを記録する"""
+        if not self.state_hashes:
+            self.first_hashed_frame = frame
+        self.state_hashes.append(state_hash)
+
+    def record(self, app, world):
+        """draw の最後に呼び、そのフレームの時間を記録する
+
+        ワーカーが進めている間にも呼ばれるので、ワールドの値は描いた world から読む。
+        """
+        self.collision_counts = app.collision_counts
+        self.command_stats = app.command_stats
+        update_histogram, draw_histogram = self.histograms[world.game_state]
+        update_histogram.record(app.update_time)
+        draw_histogram.record(app.draw_time)
+        self.frames += 1
+
+        if app.update_time + app.draw_time > self.target_time:
+            self.hitch_count += 1
+            self.pending.append(
+                {
+                    "type": "hitch",
+                    "time": time.time(),
+                    "frame": world.frame_count,
+                    "state": GAME_STATE_NAMES[world.game_state],
+                    "update_ms": app.update_time * 1000,
+                    "draw_ms": app.draw_time * 1000,
+                    "particles": len(world.particles),
+                    "bullets": len(world.bullets),
+                    "falling_minor_aliens": len(app.minor_aliens.falling),
+                    "events": list(app.frame_events),
+                }
+            )
+        if self.frames % self.histogram_interval == 0:
+            self.pending.append(self.histogram_record())
+        if self.frames % self.flush_interval == 0:
+            self.flush()
+
+    def histogram_record(self):
+        record = {
+            "type": "histogram",
+            "time": time.time(),
+            "frames": self.frames,
+            "collisions": dict(zip(COLLISION_NAMES, self.collision_counts)),
+        }
+        if self.command_stats[0]:
+            record["render_commands"] = dict(
+                zip(RENDER_COMMAND_NAMES, self.command_stats)
+            )
+        for state, (update_histogram, draw_histogram) in self.histograms.items():
+            if not update_histogram.total:
+                continue
+            record[GAME_STATE_NAMES[state]] = {
+                "update_us": update_histogram.to_dict(),
+                "draw_us": draw_histogram.to_dict(),
+                "update_p99_us": update_histogram.percentile(0.99),
+                "draw_p99_us": draw_histogram.percentile(0.99),
+            }
+        return record
+
+    def flush(self):
+        if self.state_hashes:
+            self.pending.append(
+                {
+                    "type": "state_hashes",
+                    "frame": self.first_hashed_frame,
+                    "hashes": self.state_hashes,
+                }
+            )
+            self.state_hashes = []
+        if self.pending:
+            if not self.writer:
+                self.writer = threading.Thread(target=self.write_batches, daemon=True)
+                self.writer.start()
+            self.batches.put(self.pending)
+            self.pending = []
+
+    def close(self):
+        """残りを書き出し、書き込みスレッドの終了を待つ (続けて記録すればまた書き始める)"""
+        if self.frames != self.closed_frames:
+            self.closed_frames = self.frames
+            self.pending.append(self.histogram_record())
+        self.flush()
+        if self.writer:
+            self.batches.put(None)
+            self.writer.join()
+            self.writer = None
+
+
+class App:
+    def __init__(
+        self,
+        stress_test=False,
+        threaded=False,
+        rewind=False,
+        headless=False,
+        record_commands=False,
+        gc_schedule=True,
+        frame_log=None,
+        seed=None,
+        particles=True,
+        state_hash=False,
+        fixed_point=False,
+        profiler=None,
+        fps=60,
+        display_scale=None,
+        attract=False,
+        input_source=None,
+        frame_limit=None,
+        on_exit=None,
+        turbo=1,
+        sim_hz=None,
+    ):
+        # 表示の1フレームごとに sim_hz ずつためて、fps を超えたら1回 tick フレーム分進める
+        # (進めないフレームでは、直前の2回の状態の間をたまった分の割合で補間して描く)
+        self.sim_hz, self.tick = simulation_rates(fps, sim_hz)
+        self.display_fps = fps
+        self.sim_accumulated = fps  # 最初の update で進める
+        self.interpolating = self.sim_hz < fps
+        self.pending_pressed = 0  # 進めなかったフレームで押された入力
+        self.draw_lag = 0  # 補間して描くときに、今の時刻から何フレーム前を描くか
+        # ヘッドレスではウィンドウもサウンドも使わず、NumPyの画面に描く
+        self.headless = headless
+        if headless:
+            self.gfx = FramebufferRenderer()
+        else:
+            # 解像度を320x240に変更
+            options = {"display_scale": display_scale} if display_scale else {}
+            pyxel.init(
+                SCREEN_WIDTH, SCREEN_HEIGHT, title="Barrier Attack", fps=fps, **options
+            )
+            self.gfx = pyxel
+        # パーティクルはこの画像にまとめて書いてから1回で画面に重ねる
+        self.point_layer = None if headless else PointLayer()
+        # 描画命令をいったんバッファに記録し、まとめてから本来の描画先に送る
+        self.present_gfx = self.gfx
+        self.command_stats = [0, 0, 0]  # RENDER_COMMAND_NAMES の順に数える
+        if record_commands:
+            self.gfx = CommandBuffer()
 
         # (★★★ 修正点) BGMと効果音の管理方法を刷新
         self.music_data = None
         self.se_channel = 1  # 効果音はチャンネル2を使用
         self.se_is_playing = False  # SEが再生中かどうかのフラグ
+        self.audio_queue = []  # メインスレッドでまとめて鳴らすサウンド命令
 
         try:
             with open("musics/bapy.json", "rt") as fin:
@@ -178,9 +2184,11 @@ class App:
         except Exception as e:
             print(f"BGMファイル 'musics/bapy.json' が読み込めませんでした: {e}")
 
-        self.create_sfx()  # 効果音を定義
+        if not headless:
+            self.create_sfx()  # 効果音を定義
 
         self.game_state = GameState.TITLE_DEMO
+        self.frame_count = 0  # シミュレーションが進んだフレーム数 (60Hzで数える)
         self.state_timer = 0
         self.score = 0
         self.lives = 3
@@ -188,6 +2196,7 @@ class App:
         self.demo_phase = 0
         self.demo_timer = 120
         self.demo_walker_x = -20
+        self.prev_demo_walker_x = self.demo_walker_x
         self.demo_title_reveal_x = 0
         self.demo_ai_direction = 1
         self.demo_ai_shoot_timer = 0
@@ -195,16 +2204,39 @@ class App:
         self.title_line2 = "ATTACK"
         self.title_colors = [5, 8, 11, 12, 9, 10, 7]
 
-        self.player = Player()
-        self.station = Station()
-        self.large_missile = LargeMissile()
-        self.large_missile_respawn_timer = 0
-        self.barrier_alien = BarrierAlien()
-        self.minor_aliens = []
+        # 固定小数点モードでは、ゲームの位置と速度をサブピクセルの整数で計算する
+        # (浮動小数点の誤差で環境ごとにリプレイがずれないように)
+        self.unit = SUBPIXEL if fixed_point else 1
+        self.state_formats = FIXED_STATE_FORMATS if fixed_point else FLOAT_STATE_FORMATS
+        self.missile_speed_step = to_units(0.1, self.unit)
+        self.player = Player(self.unit)
+        self.station = Station(self.unit)
+        self.large_missiles = []
+        self.large_missile_count = 1
+        self.barrier_aliens = []
+        self.barrier_alien_count = 1
+        self.minor_aliens = MinorAlienSet(np.int32 if fixed_point else np.float64)
         self.minor_alien_count = 16
         self.minor_alien_respawn_timer = 0
-        self.bullets = []
-        self.particles = []
+        self.bullets = FixedBulletArrays() if fixed_point else BulletArrays()
+        self.scratch = ScratchArrays()  # 当たり判定で毎フレーム使う作業用の配列
+        self.particles = ParticleArrays()
+        # 画面外に出て早めに消したパーティクルと、描かずに済ませた数
+        self.particles_retired = 0
+        self.particle_updates_saved = 0  # 消さなければ寿命まで続いた更新の回数
+        self.particle_draws_skipped = 0
+        self.collision_counts = [0] * len(COLLISION_NAMES)  # 衝突イベントの種類ごとの数
+        self.auto_fire_interval = 0  # 0以外ならデモのAIがこの間隔で連射する
+        # 乱数は処理ごとに別の列から引く (見た目だけのパーティクルを止めても
+        # ゲームの進み方は変わらない)
+        self.random_streams = create_random_streams(seed)
+        (
+            self.particle_random,
+            self.barrier_alien_random,
+            self.attacker_random,
+            self.demo_ai_random,
+        ) = self.random_streams
+        self.particles_enabled = particles
 
         # バリアのY座標を調整
         self.barrier_y = 50
@@ -215,8 +2247,84 @@ class App:
         self.barrier_disabled_timer = 0
 
         self.can_shoot = True
+        self.ui_lives = None  # UIの文字列を作ったときの値
+        self.ui_score = None
+
+        # フレーム時間の計測値 (秒)
+        self.update_time = 0
+        self.draw_time = 0
+        self.enemies_time = 0
+        self.collisions_time = 0
+
+        self.governor = QualityGovernor(target_time=1 / fps)
+        # ヘッドレスでは描画結果が計測値で変わらないように品質を固定する
+        self.governor.enabled = not headless
+        # フレームの途中でGCが走らないよう、回収のタイミングを自分で決める
+        self.gc_scheduler = GcScheduler(target_time=1 / fps)
+        self.gc_scheduler.enabled = gc_schedule
+        # 予算超過フレームの解析用に、そのフレームで起きた出来事を集める
+        self.step_events = []
+        self.frame_events = []
+        self.frame_logger = (
+            FrameLogger(frame_log, target_time=1 / fps) if frame_log else None
+        )
+        # シミュレーションが変わっていないか確かめるため、毎フレームの状態のハッシュを取る
+        self.state_hasher = StateHasher(self.state_formats) if state_hash else None
+        self.state_hash = 0
+        # 入力は update の最初に1回だけ読み、ゲームの処理はこの値だけを見る
+        # (input_source を差し替えれば記録や通信、ボットの入力で動かせる)
+        if input_source is None:
+            input_source = no_input if headless else sample_input
+        self.input_source = input_source
+        self.input_bits = 0
+        self.input_pressed = 0  # このフレームで押されたビット
+
+        # 店頭用のデモだけのモードでは、スタートボタンでゲームを始めない
+        self.attract = attract
+        self.throughput = ThroughputMeter()
+        # 早送りでは1フレームにこの回数だけ進め、描かない回は音とパーティクルを省く
+        self.turbo_steps = turbo
+        self.fast_forwarding = False
+        self.frame_limit = frame_limit  # 描いたフレームがこの数になったら終了する
+
         self.reset_full_demo()
-        pyxel.run(self.update, self.draw)
+        self.stress_test = StressTest() if stress_test else None
+        if self.stress_test:
+            # 計測値が変わらないように品質は固定する
+            self.governor.enabled = False
+            self.stress_test.apply_scale(self)
+        # BACKSPACEを押している間、記録した直近10秒を巻き戻す
+        self.rewind = RewindBuffer(fps=self.sim_hz) if rewind else None
+        self.rewind_cursor = None  # 巻き戻し中に表示しているフレーム番号
+        # シミュレーションを別スレッドで回し、描画は最新のスナップショットから行う
+        self.worker = SimulationWorker(self) if threaded else None
+        # プロファイルを取るときは、計測を入り切りする update と draw を使う
+        self.frame_callbacks = (
+            profiler.wrap(self.update, self.draw)
+            if profiler
+            else (self.update, self.draw)
+        )
+        if not headless:
+            # pyxel.run からは戻らないので、終了時の報告と書き出しは atexit で行う
+            if self.frame_logger:
+                atexit.register(self.frame_logger.close)
+            if on_exit:
+                atexit.register(on_exit, self)
+            self.gc_scheduler.start()
+            pyxel.run(*self.frame_callbacks)
+
+    def run_headless(self, frames):
+        """ウィンドウを開かずに指定フレーム数だけ更新と描画を繰り返す"""
+        update, draw = self.frame_callbacks
+        self.gc_scheduler.start()
+        try:
+            for _ in range(frames):
+                update()
+                draw()
+        finally:
+            self.gc_scheduler.stop()
+            if self.frame_logger:
+                self.frame_logger.close()
 
     def create_sfx(self):
         # 効果音をサウンド番号30番以降に定義
@@ -228,6 +2336,39 @@ class App:
         pyxel.sounds[35].set("g2", "p", "6", "f", 10)  # 小さいヒット
 
     def play_bgm(self):
+        """BGMの再生を予約する"""
+        self.audio_queue.append(AUDIO_PLAY_BGM)
+
+    def stop_audio(self):
+        """全チャンネルの停止を予約する"""
+        self.audio_queue.append(AUDIO_STOP)
+
+    def play_se(self, sound_no):
+        """効果音の割り込み再生を予約する"""
+        if not self.fast_forwarding:
+            self.audio_queue.append(sound_no)
+
+    def update_audio(self):
+        """予約されたサウンド命令をメインスレッドでまとめて実行する"""
+        if self.headless:
+            self.audio_queue.clear()
+            return
+        # BGM復帰処理を毎フレーム確認
+        if (
+            self.game_state == GameState.PLAYING
+            or self.game_state == GameState.AUTO_PLAY_DEMO
+        ):
+            self.update_bgm_resume()
+        for command in self.audio_queue:
+            if command == AUDIO_PLAY_BGM:
+                self.start_bgm()
+            elif command == AUDIO_STOP:
+                pyxel.stop()
+            else:
+                self.start_se(command)
+        self.audio_queue.clear()
+
+    def start_bgm(self):
         """BGMを再生する"""
         if self.music_data:
             # チャンネル0,1,3をBGM用に再生
@@ -238,7 +2379,7 @@ class App:
             # SEチャンネルも、対応するBGMサウンドで再生開始
             pyxel.play(self.se_channel, self.se_channel, loop=True)
 
-    def play_se(self, sound_no):
+    def start_se(self, sound_no):
         """効果音を割り込み再生する"""
         pyxel.play(self.se_channel, sound_no, loop=False)
         self.se_is_playing = True
@@ -265,10 +2406,15 @@ class App:
     def init_entities(self, is_for_demo=False):
         self.player.reset(is_for_demo)
         self.station.reset()
-        self.large_missile.reset()
-        self.barrier_alien.reset()
+        self.large_missiles = [
+            LargeMissile(i, self.unit) for i in range(self.large_missile_count)
+        ]
+        self.barrier_aliens = [
+            BarrierAlien(i, self.unit) for i in range(self.barrier_alien_count)
+        ]
         self.minor_aliens.clear()
-        self.spawn_minor_aliens()
+        for i in range(self.minor_alien_count):
+            self.minor_aliens.add(MinorAlien(i, self.unit), ALIEN_IDLE)
         self.bullets.clear()
         self.particles.clear()
 
@@ -277,7 +2423,8 @@ class App:
         self.demo_phase = 0
         self.demo_timer = 120
         self.demo_walker_x = -20
-        pyxel.stop()
+        self.prev_demo_walker_x = self.demo_walker_x
+        self.stop_audio()
 
     def start_autoplay_demo(self):
         self.game_state = GameState.AUTO_PLAY_DEMO
@@ -287,15 +2434,17 @@ class App:
         self.play_bgm()  # デモでもBGMを再生
 
     def spawn_minor_aliens(self):
-        existing_indices = {alien.original_index for alien in self.minor_aliens}
-        for i in range(self.minor_alien_count):
-            if i not in existing_indices:
-                self.minor_aliens.append(MinorAlien(i))
+        self.minor_aliens.spawn(self.minor_alien_count)
 
-    def create_particle_burst(self, x, y, options):
-        count = options.get("count", 10)
-        for _ in range(count):
-            self.particles.append(Particle(x, y, options))
+    def create_particle_burst(self, x, y, preset):
+        count = max(1, int(preset.count * self.governor.particle_scale))
+        self.step_events.append("burst")
+        if not self.particles_enabled or self.fast_forwarding:
+            return
+        # 読み始める位置だけを乱数で決める (セーブステートの乱数の状態で再現できる)
+        offset = self.particle_random.randrange(preset.table_size)
+        # パーティクルは見た目だけなのでピクセル単位の浮動小数点で持つ
+        preset.spawn(self.particles, x / self.unit, y / self.unit, count, offset)
 
     def is_colliding(self, rect1, rect2):
         return (
@@ -306,13 +2455,157 @@ class App:
         )
 
     def update(self):
-        # BGM復帰処理を毎フレーム確認
-        if (
-            self.game_state == GameState.PLAYING
-            or self.game_state == GameState.AUTO_PLAY_DEMO
+        if self.worker:
+            # 前のティックの完了を待ってからメインスレッドの処理を行う
+            self.worker.wait()
+            self.update_time = self.worker.step_time
+            if self.worker.stepped:
+                self.worker.stepped = False
+                self.log_state_hash()
+        self.read_input(self.input_source())
+        if self.rewind and self.update_rewind():
+            return
+        self.update_turbo()
+        self.sim_accumulated += self.sim_hz
+        if self.sim_accumulated <= self.display_fps:
+            # 進めないフレームで押した入力は次に進めるときに渡す
+            self.pending_pressed |= self.input_pressed
+            self.update_time = 0
+            self.update_audio()
+            return
+        self.sim_accumulated -= self.display_fps
+        self.input_pressed |= self.pending_pressed
+        self.pending_pressed = 0
+        if not self.worker:
+            start = time.perf_counter()
+            self.advance()
+            self.update_time = time.perf_counter() - start
+            self.finish_step()
+            self.log_state_hash()
+        # ワーカーが次のティックで書き込むので、このフレームの分と入れ替える
+        self.frame_events, self.step_events = self.step_events, self.frame_events
+        self.step_events.clear()
+        self.update_audio()
+        if self.stress_test:
+            self.stress_test.on_update(self)
+        if self.worker:
+            # 描画と並行して次のティックを計算させる
+            self.worker.start_step()
+
+    def finish_step(self):
+        """進めた直後の状態を巻き戻し用に記録し、ハッシュを取る (ワーカーではそのスレッドで呼ぶ)"""
+        if self.rewind:
+            self.rewind.record(self.save_state())
+        if self.state_hasher:
+            self.state_hash = self.state_hasher.hash(self)
+
+    def log_state_hash(self):
+        """進めた結果を受け取ったら、その状態のハッシュをフレームログに書く"""
+        if self.frame_logger and self.state_hasher:
+            self.frame_logger.record_state_hash(self.frame_count, self.state_hash)
+
+    def read_input(self, bits):
+        """このフレームの入力を設定し、前のフレームから押されたビットを求める"""
+        self.input_pressed = bits & ~self.input_bits
+        self.input_bits = bits
+
+    def update_rewind(self):
+        """巻き戻し中ならTrueを返す (その間シミュレーションは止める)"""
+        if self.input_bits & INPUT_REWIND:
+            oldest = self.rewind.oldest_frame()
+            newest = self.rewind.newest_frame()
+            if newest < oldest:
+                # まだ戻れるフレームを記録していない
+                return True
+            if self.rewind_cursor is None:
+                self.rewind_cursor = newest
+            self.rewind_cursor = min(newest, max(oldest, self.rewind_cursor - 1))
+            self.load_state(self.rewind.restore(self.rewind_cursor))
+            if self.worker:
+                self.worker.snapshots.publish(WorldSnapshot(self))
+            return True
+        if self.rewind_cursor is not None:
+            # 離したフレームから記録し直す
+            self.rewind.truncate(self.rewind_cursor)
+            self.rewind_cursor = None
+            print(self.rewind.report())
+        return False
+
+    def update_turbo(self):
+        """PAGEUP/PAGEDOWN で早送りの倍率を倍にしたり半分にしたりする"""
+        if self.input_pressed & INPUT_TURBO_UP:
+            self.turbo_steps = min(TURBO_MAX_STEPS, self.turbo_steps * 2)
+        elif self.input_pressed & INPUT_TURBO_DOWN:
+            self.turbo_steps = max(1, self.turbo_steps // 2)
+
+    def advance(self):
+        """1フレーム分、turbo_steps 回ゲームを進める
+
+        押した瞬間の入力は最初の1回だけが受け取る。描かれない途中の回では
+        効果音とパーティクルを出さない (ゲームの進み方は変わらない)。
+        """
+        pressed = self.input_pressed
+        if self.interpolating:
+            self.remember_positions()
+        self.fast_forwarding = True
+        for _ in range(self.turbo_steps - 1):
+            self.step()
+            self.input_pressed = 0
+        self.fast_forwarding = False
+        self.step()
+        self.input_pressed = pressed
+
+    def remember_positions(self):
+        """描画で補間できるように、進める前の位置を覚えておく"""
+        for entity in (
+            self.player,
+            *self.large_missiles,
+            *self.barrier_aliens,
+            *self.minor_aliens.falling,
         ):
-            self.update_bgm_resume()
-
+            entity.prev_x = entity.x
+            entity.prev_y = entity.y
+        self.prev_demo_walker_x = self.demo_walker_x
+
+    def interpolation_alpha(self):
+        """直前の2回の状態のうち、新しいほうにどれだけ寄せて描くか (0〜1)"""
+        return self.sim_accumulated / self.display_fps
+
+    @property
+    def barrier_time(self):
+        """バリアの波を描く時刻 (補間して描いている間は少し前になる)"""
+        return self.frame_count - self.draw_lag
+
+    def move_to_interpolated(self, alpha):
+        """描く間だけ、動くものを補間した位置に動かし、元に戻すための値を返す"""
+        moving = (
+            self.player,
+            *self.large_missiles,
+            *self.barrier_aliens,
+            *self.minor_aliens.falling,
+        )
+        saved = [(entity, entity.x, entity.y) for entity in moving]
+        interpolate_entities(moving, alpha, INTERPOLATION_SNAP_DISTANCE)
+        back = 1 - alpha
+        self.draw_lag = self.tick * back
+        bullet_ys = self.bullets.y[: self.bullets.count]
+        saved_bullet_ys = bullet_ys.copy()
+        bullet_ys += BULLET_SPEED * self.tick * back
+        walker_x = self.demo_walker_x
+        self.demo_walker_x -= (walker_x - self.prev_demo_walker_x) * back
+        return saved, saved_bullet_ys, walker_x
+
+    def restore_positions(self, moved):
+        """move_to_interpolated で動かしたものを元の位置に戻す"""
+        saved, saved_bullet_ys, self.demo_walker_x = moved
+        for entity, x, y in saved:
+            entity.x = x
+            entity.y = y
+        self.bullets.y[: self.bullets.count] = saved_bullet_ys
+        self.draw_lag = 0
+
+    def step(self):
+        """tick フレーム分ゲームを進める"""
         if self.game_state == GameState.TITLE_DEMO:
             self.update_title_demo()
         elif self.game_state == GameState.AUTO_PLAY_DEMO:
@@ -321,19 +2614,24 @@ class App:
             self.update_playing()
         elif self.game_state == GameState.GAME_OVER:
             self.update_game_over()
+        self.frame_count += self.tick
 
-        if self.game_state in [GameState.TITLE_DEMO, GameState.AUTO_PLAY_DEMO]:
-            if pyxel.btnp(pyxel.KEY_RETURN):
+        if self.game_state in (GameState.TITLE_DEMO, GameState.AUTO_PLAY_DEMO):
+            if (
+                self.input_pressed & INPUT_START
+                and not self.stress_test
+                and not self.attract
+            ):
                 self.reset_game()
 
     def update_title_demo(self):
-        speed = 1.25
+        speed = 1.25 * self.tick
         char_width1 = 16
         total_width = len(self.title_line1) * char_width1
-        title_x = (pyxel.width - total_width) / 2
+        title_x = (SCREEN_WIDTH - total_width) / 2
 
         if self.demo_phase == 0:
-            self.demo_timer -= 1
+            self.demo_timer -= self.tick
             if self.demo_timer <= 0:
                 self.demo_phase = 1
         elif self.demo_phase == 1:
@@ -357,71 +2655,79 @@ class App:
                 self.demo_phase = 5
         elif self.demo_phase == 5:
             self.demo_walker_x += speed
-            if self.demo_walker_x > pyxel.width + 10:
+            if self.demo_walker_x > SCREEN_WIDTH + 10:
                 self.demo_phase = 6
                 self.demo_timer = 180
         elif self.demo_phase == 6:
-            self.demo_timer -= 1
+            self.demo_timer -= self.tick
             if self.demo_timer <= 0:
                 self.start_autoplay_demo()
 
     def update_autoplay_demo(self):
-        self.state_timer -= 1
+        self.state_timer -= self.tick
         if self.state_timer <= 0:
             self.reset_full_demo()
             return
 
-        if random.random() < 0.01:
+        if self.demo_ai_random.random() < 0.01 * self.tick:
             self.demo_ai_direction *= -1
 
-        self.player.x += self.player.speed * self.demo_ai_direction
-        self.player.x = max(0, min(self.player.x, pyxel.width - self.player.w))
+        self.player.x += self.player.speed * self.demo_ai_direction * self.tick
+        self.player.x = max(
+            0, min(self.player.x, SCREEN_WIDTH * self.unit - self.player.w)
+        )
 
-        self.demo_ai_shoot_timer -= 1
+        self.demo_ai_shoot_timer -= self.tick
         if self.demo_ai_shoot_timer <= 0:
-            self.bullets.append(
-                Bullet(self.player.x + self.player.w / 2 - 1, self.player.y)
+            self.bullets.add(
+                self.player.x + self.player.w // 2 - self.unit, self.player.y
             )
             self.play_se(30)
-            self.demo_ai_shoot_timer = 30 + random.random() * 60
+            if self.auto_fire_interval:
+                self.demo_ai_shoot_timer = self.auto_fire_interval
+            else:
+                self.demo_ai_shoot_timer = 30 + self.demo_ai_random.random() * 60
 
         self.update_world()
 
     def update_playing(self):
-        if pyxel.btn(pyxel.KEY_LEFT):
-            self.player.x -= self.player.speed
-        if pyxel.btn(pyxel.KEY_RIGHT):
-            self.player.x += self.player.speed
+        if self.input_bits & INPUT_LEFT:
+            self.player.x -= self.player.speed * self.tick
+        if self.input_bits & INPUT_RIGHT:
+            self.player.x += self.player.speed * self.tick
 
-        self.player.x = max(0, min(self.player.x, pyxel.width - self.player.w))
+        self.player.x = max(
+            0, min(self.player.x, SCREEN_WIDTH * self.unit - self.player.w)
+        )
 
-        if pyxel.btn(pyxel.KEY_CTRL) and self.can_shoot and self.player.is_alive:
-            self.bullets.append(
-                Bullet(self.player.x + self.player.w / 2 - 1, self.player.y)
+        is_firing = self.input_bits & INPUT_FIRE
+        if is_firing and self.can_shoot and self.player.is_alive:
+            self.bullets.add(
+                self.player.x + self.player.w // 2 - self.unit, self.player.y
             )
             self.play_se(30)
             self.can_shoot = False
 
-        if not pyxel.btn(pyxel.KEY_CTRL):
+        if not is_firing:
             self.can_shoot = True
 
         if not self.player.is_alive:
-            self.player.respawn_timer -= 1
+            self.player.respawn_timer -= self.tick
             if self.player.respawn_timer <= 0:
                 if self.lives > 0:
                     self.player.is_alive = True
-                    self.player.x = pyxel.width / 2 - self.player.w / 2
+                    self.player.x = (SCREEN_WIDTH * self.unit - self.player.w) // 2
                     self.player.invincibility_timer = 180
                 else:
                     self.set_game_over()
         else:
             if self.player.invincibility_timer > 0:
-                self.player.invincibility_timer -= 1
+                self.player.invincibility_timer -= self.tick
 
         self.update_world()
 
     def update_game_over(self):
-        self.state_timer -= 1
+        self.state_timer -= self.tick
         if self.state_timer <= 0:
             self.reset_full_demo()
             return
@@ -429,211 +2735,359 @@ class App:
         self.update_world()
 
     def update_world(self):
-        for p in self.particles[:]:
-            p.update()
-            if p.life <= 0:
-                self.particles.remove(p)
+        for _ in range(self.tick):
+            retired, saved = self.particles.update()
+            self.particles_retired += retired
+            self.particle_updates_saved += saved
 
-        for bullet in self.bullets[:]:
-            bullet.y -= bullet.speed
-            if bullet.y < 0:
-                self.bullets.remove(bullet)
+        self.bullets.update(self.tick)
 
         if self.is_barrier_disabled:
-            self.barrier_disabled_timer -= 1
+            self.barrier_disabled_timer -= self.tick
             if self.barrier_disabled_timer <= 0:
                 self.is_barrier_disabled = False
-                if not self.barrier_alien.is_alive:
-                    self.barrier_alien.reset()
+                for barrier_alien in self.barrier_aliens:
+                    if not barrier_alien.is_alive:
+                        barrier_alien.reset()
 
+        start = time.perf_counter()
         self.update_enemies()
+        middle = time.perf_counter()
         self.check_collisions()
+        self.enemies_time = middle - start
+        self.collisions_time = time.perf_counter() - middle
 
     def update_enemies(self):
-        if self.large_missile.is_alive:
-            self.large_missile.x -= self.large_missile.speed
-        else:
-            self.large_missile_respawn_timer -= 1
-            if self.large_missile_respawn_timer <= 0:
-                self.large_missile.is_alive = True
-                self.large_missile.x = pyxel.width
-                self.large_missile.speed += 0.1
-
-        if self.barrier_alien.is_alive:
-            self.barrier_alien.x += (
-                self.barrier_alien.speed * self.barrier_alien.direction
-            )
-            if random.random() < 0.02:
-                self.barrier_alien.speed = 1 + random.random() * 2
-            if random.random() < 0.01:
-                self.barrier_alien.direction *= -1
+        for missile in self.large_missiles:
+            if missile.is_alive:
+                missile.x -= missile.speed * self.tick
+            else:
+                missile.respawn_timer -= self.tick
+                if missile.respawn_timer <= 0:
+                    missile.is_alive = True
+                    missile.x = SCREEN_WIDTH * self.unit
+                    missile.speed += self.missile_speed_step
+
+        rng = self.barrier_alien_random
+        # 1回で複数フレーム進めるときは、起きる確率もその分だけ上げる
+        for barrier_alien in self.barrier_aliens:
+            if not barrier_alien.is_alive:
+                continue
+            barrier_alien.x += barrier_alien.speed * barrier_alien.direction * self.tick
+            if rng.random() < 0.02 * self.tick:
+                barrier_alien.speed = to_units(1 + rng.random() * 2, self.unit)
+            if rng.random() < 0.01 * self.tick:
+                barrier_alien.direction *= -1
             if (
-                self.barrier_alien.x < 0
-                or self.barrier_alien.x + self.barrier_alien.w > pyxel.width
+                barrier_alien.x < 0
+                or barrier_alien.x + barrier_alien.w > SCREEN_WIDTH * self.unit
             ):
-                self.barrier_alien.direction *= -1
+                barrier_alien.direction *= -1
 
-        self.minor_alien_respawn_timer -= 1
+        self.minor_alien_respawn_timer -= self.tick
         if self.minor_alien_respawn_timer <= 0:
             self.spawn_minor_aliens()
             self.minor_alien_respawn_timer = 600
 
-        is_player_moving = pyxel.btn(pyxel.KEY_LEFT) or pyxel.btn(pyxel.KEY_RIGHT)
-        is_demo_or_over = self.game_state in [
+        is_player_moving = self.input_bits & (INPUT_LEFT | INPUT_RIGHT)
+        is_demo_or_over = self.game_state in (
             GameState.AUTO_PLAY_DEMO,
             GameState.GAME_OVER,
-        ]
+        )
 
-        if (is_player_moving or is_demo_or_over) and random.random() < 0.03:
-            non_falling_aliens = [a for a in self.minor_aliens if not a.is_falling]
-            if non_falling_aliens:
-                attacker = random.choice(non_falling_aliens)
-                attacker.is_falling = True
-                attacker.fall_speed_y = 1.25 + random.random() * 1.25
-                attacker.fall_speed_x = (random.random() - 0.5) * 1.25
-
-        for alien in self.minor_aliens[:]:
-            if alien.is_falling:
-                alien.y += alien.fall_speed_y
-                alien.x += alien.fall_speed_x
-                if alien.x < 0 or alien.x + alien.w > pyxel.width:
-                    alien.fall_speed_x *= -1
-                if alien.y > pyxel.height:
-                    alien.reset()
+        rng = self.attacker_random
+        if (is_player_moving or is_demo_or_over) and rng.random() < 0.03 * self.tick:
+            if self.minor_aliens.idle:
+                attacker = rng.choice(self.minor_aliens.idle)
+                self.minor_aliens.start_falling(attacker)
+                attacker.fall_speed_y = to_units(1.25 + rng.random() * 1.25, self.unit)
+                attacker.fall_speed_x = to_units((rng.random() - 0.5) * 1.25, self.unit)
+
+        # 隊列に戻った敵は末尾の敵と入れ替わるので後ろから処理する
+        falling = self.minor_aliens.falling
+        for i in range(len(falling) - 1, -1, -1):
+            alien = falling[i]
+            alien.y += alien.fall_speed_y * self.tick
+            alien.x += alien.fall_speed_x * self.tick
+            if alien.x < 0 or alien.x + alien.w > SCREEN_WIDTH * self.unit:
+                alien.fall_speed_x *= -1
+            if alien.y > SCREEN_HEIGHT * self.unit:
+                self.minor_aliens.land(alien)
 
     def check_collisions(self):
-        is_non_interactive = self.game_state in [
+        is_non_interactive = self.game_state in (
             GameState.AUTO_PLAY_DEMO,
             GameState.GAME_OVER,
-        ]
-
-        for b in self.bullets[:]:
-            if self.station.is_alive and self.is_colliding(b, self.station):
-                self.destroy_station(is_non_interactive)
-                self.bullets.remove(b)
-                return
-            if not self.is_barrier_disabled:
-                time = pyxel.frame_count
-                dynamic_amplitude = self.barrier_amplitude + 2 * math.sin(time / 20)
-                barrier_y_at_bullet = (
-                    self.barrier_y
-                    + math.sin(b.x * self.barrier_frequency - time / 15.0)
-                    * dynamic_amplitude
+        )
+        self.resolve_collisions(self.detect_collisions(), is_non_interactive)
+
+    def detect_collisions(self):
+        """当たり判定だけを行い、衝突イベントを起きる順に並べて返す (状態は変えない)
+
+        イベントは (種類, 弾の番号, 相手) で、弾が関係しないときの番号は-1。
+        バリアに当たったときの相手は当たった位置のY座標になる。
+        前の弾で倒されることになった相手やバリアの解除は後の弾の判定に反映する。
+        """
+        events = []
+        # このフレームで倒されることが決まった相手 (数体なのでリストで足りる)
+        claimed = []
+        barrier_disabled = self.is_barrier_disabled
+        station = self.station
+        player = self.player
+        is_player_vulnerable = (
+            player.is_alive
+            and player.invincibility_timer <= 0
+            and self.game_state in (GameState.PLAYING, GameState.AUTO_PLAY_DEMO)
+        )
+        minor_aliens = self.minor_aliens
+        bullets = self.bullets
+        if bullets:
+            x = bullets.x[: bullets.count]
+            y = bullets.y[: bullets.count]
+            w = BULLET_WIDTH * self.unit
+            h = BULLET_HEIGHT * self.unit
+            n = len(x)
+            scratch = self.scratch
+            station_hits = overlap_matrix(
+                x,
+                y,
+                w,
+                h,
+                entity_boxes((station,), scratch, "station_boxes"),
+                scratch,
+                "station_hits",
+            )[:, 0]
+            barrier_ys = self.barrier_contact_ys(x, scratch)
+            distances = np.subtract(y, barrier_ys, out=scratch.get("distances", n))
+            barrier_hits = np.less(
+                np.abs(distances, out=scratch.get("abs_distances", n)),
+                (self.barrier_thickness + 5) * self.unit,
+                out=scratch.get("barrier_hits", n, bool),
+            )
+            missile_hits = overlap_matrix(
+                x,
+                y,
+                w,
+                h,
+                entity_boxes(self.large_missiles, scratch, "missile_boxes"),
+                scratch,
+                "missile_hits",
+            )
+            barrier_alien_hits = overlap_matrix(
+                x,
+                y,
+                w,
+                h,
+                entity_boxes(self.barrier_aliens, scratch, "barrier_alien_boxes"),
+                scratch,
+                "barrier_alien_hits",
+            )
+            minor_alien_hits = overlap_matrix(
+                x, y, w, h, minor_aliens.boxes(), scratch, "minor_alien_hits"
+            )
+            # 何にも重なっていない弾は調べなくてよい
+            is_candidate = np.logical_or(
+                station_hits, barrier_hits, out=scratch.get("is_candidate", n, bool)
+            )
+            any_hits = scratch.get("any_hits", n, bool)
+            # 行ごとの any は作業領域を確保するので、重なりがある表だけ調べる
+            for hits in (missile_hits, barrier_alien_hits, minor_alien_hits):
+                if np.count_nonzero(hits):
+                    is_candidate |= np.any(hits, axis=1, out=any_hits)
+            candidates = []
+            if np.count_nonzero(is_candidate):
+                candidates = np.flatnonzero(is_candidate).tolist()
+            # 弾ごとに、ステーション、バリア、大型ミサイル、バリアエイリアン、
+            # 小さい敵の順で最初に当たったものだけをイベントにする
+            for i in candidates:
+                if station.is_alive and station not in claimed and station_hits[i]:
+                    claimed.append(station)
+                    events.append((HIT_STATION, i, station))
+                    continue
+                if not barrier_disabled and barrier_hits[i]:
+                    events.append((HIT_BARRIER, i, barrier_ys[i].item()))
+                    continue
+                # 大型ミサイルにはバリアが解除されているときだけ当たる
+                if barrier_disabled:
+                    missile = first_hit(self.large_missiles, missile_hits[i], claimed)
+                    if missile:
+                        claimed.append(missile)
+                        events.append((HIT_MISSILE, i, missile))
+                        continue
+                barrier_alien = first_hit(
+                    self.barrier_aliens, barrier_alien_hits[i], claimed
                 )
-                if abs(b.y - barrier_y_at_bullet) < self.barrier_thickness + 5:
-                    self.create_particle_burst(
-                        b.x,
-                        barrier_y_at_bullet,
-                        {"count": 10, "color": 12, "life": 30, "speed": 2, "size": 2},
-                    )
-                    self.play_se(31)
-                    self.bullets.remove(b)
+                if barrier_alien:
+                    claimed.append(barrier_alien)
+                    barrier_disabled = True
+                    events.append((HIT_BARRIER_ALIEN, i, barrier_alien))
                     continue
-            if (
-                self.large_missile.is_alive
-                and self.is_barrier_disabled
-                and self.is_colliding(b, self.large_missile)
-            ):
+                for j in np.flatnonzero(minor_alien_hits[i]).tolist():
+                    alien = minor_aliens.at(j)
+                    if alien not in claimed:
+                        claimed.append(alien)
+                        events.append((HIT_MINOR_ALIEN, i, alien))
+                        break
+
+        if is_player_vulnerable and minor_aliens:
+            for j in overlapping(player, minor_aliens.boxes()):
+                alien = minor_aliens.at(j)
+                if alien not in claimed:
+                    claimed.append(alien)
+                    events.append((HIT_PLAYER, -1, alien))
+                    break
+
+        if station.is_alive and station not in claimed:
+            for missile in self.large_missiles:
+                if (
+                    missile.is_alive
+                    and missile not in claimed
+                    and self.is_colliding(missile, station)
+                ):
+                    events.append((HIT_STATION, -1, missile))
+                    break
+        return events
+
+    def barrier_contact_ys(self, x, scratch):
+        """x の位置でのバリアの波のY座標を scratch の作業用配列に求める
+
+        固定小数点モードでは整数の表から求める。
+        """
+        time = self.frame_count
+        if self.unit == 1:
+            dynamic_amplitude = self.barrier_amplitude + 2 * math.sin(time / 20)
+            # 要素が1個の配列をその場で書き換えると作業領域が確保されるので、
+            # 2つの配列に交互に書く
+            ys = scratch.get("barrier_ys", len(x))
+            phases = np.multiply(
+                x, self.barrier_frequency, out=scratch.get("barrier_phases", len(x))
+            )
+            np.subtract(phases, time / 15.0, out=ys)
+            np.sin(ys, out=phases)
+            np.multiply(phases, dynamic_amplitude, out=ys)
+            return np.add(ys, self.barrier_y, out=phases)
+        # 位相を表の番号にする係数 (16ビットの固定小数点)
+        steps = SINE_TABLE_SIZE / (2 * math.pi) * 65536
+        x_phase = round(self.barrier_frequency / self.unit * steps)
+        time_phase = round(steps / 15)
+        mask = SINE_TABLE_SIZE - 1
+        amplitude = self.barrier_amplitude * self.unit + 2 * int(
+            SINE_TABLE[(time * round(steps / 20) >> 16) & mask]
+        )
+        phase = scratch.get("barrier_phases", len(x), np.int64)
+        np.copyto(phase, x)
+        phase *= x_phase
+        phase -= time * time_phase
+        phase >>= 16
+        phase &= mask
+        ys = scratch.get("barrier_ys", len(x), np.int64)
+        np.take(SINE_TABLE, phase, out=ys, mode="wrap")
+        ys *= amplitude
+        ys >>= 8
+        ys += self.barrier_y * self.unit
+        return ys
+
+    def resolve_collisions(self, events, is_non_interactive):
+        """衝突イベントを順に適用し、得点、パーティクル、効果音をまとめて反映する"""
+        if not events:
+            return
+        sounds = []
+        removed_bullets = []
+        for kind, bullet, target in events:
+            self.collision_counts[kind] += 1
+            if bullet >= 0:
+                removed_bullets.append(bullet)
+            if kind == HIT_STATION:
+                self.destroy_station(sounds, is_non_interactive)
+            elif kind == HIT_BARRIER:
+                self.create_particle_burst(
+                    self.bullets.x[bullet].item(), target, BARRIER_HIT_BURST
+                )
+                sounds.append(31)
+            elif kind == HIT_MISSILE:
                 self.create_particle_burst(
-                    self.large_missile.x + self.large_missile.w / 2,
-                    self.large_missile.y + self.large_missile.h / 2,
-                    {"count": 50, "color": 10, "life": 60, "speed": 4, "size": 3},
+                    target.x + target.w / 2, target.y + target.h / 2, MISSILE_BURST
                 )
                 if not is_non_interactive:
                     self.score += 500
-                self.play_se(33)
-                self.bullets.remove(b)
-                self.large_missile.is_alive = False
-                self.large_missile_respawn_timer = 180
-                continue
-            if self.barrier_alien.is_alive and self.is_colliding(b, self.barrier_alien):
+                sounds.append(33)
+                target.is_alive = False
+                target.respawn_timer = 180
+            elif kind == HIT_BARRIER_ALIEN:
                 self.create_particle_burst(
-                    self.barrier_alien.x + self.barrier_alien.w / 2,
-                    self.barrier_alien.y + self.barrier_alien.h / 2,
-                    {"count": 30, "color": 11, "life": 42, "speed": 3, "size": 2},
+                    target.x + target.w / 2,
+                    target.y + target.h / 2,
+                    BARRIER_ALIEN_BURST,
                 )
                 if not is_non_interactive:
                     self.score += 200
-                self.play_se(34)
+                sounds.append(34)
                 self.is_barrier_disabled = True
                 self.barrier_disabled_timer = 180
-                self.barrier_alien.is_alive = False
-                self.bullets.remove(b)
-                continue
-            bullet_removed = False
-            for m in self.minor_aliens[:]:
-                if self.is_colliding(b, m):
+                target.is_alive = False
+            elif kind == HIT_MINOR_ALIEN:
+                self.create_particle_burst(
+                    target.x + target.w / 2, target.y + target.h / 2, MINOR_ALIEN_BURST
+                )
+                self.minor_aliens.destroy(target)
+                if not is_non_interactive:
+                    self.score += 50
+                sounds.append(35)
+            elif kind == HIT_PLAYER:
+                if self.game_state == GameState.PLAYING:
+                    self.player_hit(sounds)
+                elif self.game_state == GameState.AUTO_PLAY_DEMO:
                     self.create_particle_burst(
-                        m.x + m.w / 2,
-                        m.y + m.h / 2,
-                        {"count": 20, "color": 9, "life": 30, "speed": 2.5, "size": 2},
+                        self.player.x + self.player.w / 2,
+                        self.player.y + self.player.h / 2,
+                        PLAYER_BURST,
                     )
-                    self.minor_aliens.remove(m)
-                    if not is_non_interactive:
-                        self.score += 50
-                    self.play_se(35)
-                    self.bullets.remove(b)
-                    bullet_removed = True
-                    break
-            if bullet_removed:
-                continue
+                    self.player.x = (SCREEN_WIDTH * self.unit - self.player.w) // 2
+                else:
+                    # 同じフレームでステーションが壊れてゲームオーバーになった
+                    continue
+                self.minor_aliens.destroy(target)
 
-        if self.player.is_alive and self.player.invincibility_timer <= 0:
-            for m in self.minor_aliens[:]:
-                if self.is_colliding(self.player, m):
-                    if self.game_state == GameState.PLAYING:
-                        self.player_hit()
-                        self.minor_aliens.remove(m)
-                        break
-                    elif self.game_state == GameState.AUTO_PLAY_DEMO:
-                        self.create_particle_burst(
-                            self.player.x + self.player.w / 2,
-                            self.player.y + self.player.h / 2,
-                            {
-                                "count": 80,
-                                "color": 8,
-                                "life": 78,
-                                "speed": 5,
-                                "size": 3,
-                            },
-                        )
-                        self.player.x = pyxel.width / 2 - self.player.w / 2
-                        self.minor_aliens.remove(m)
-                        break
+        self.play_sounds(sounds)
+        if removed_bullets:
+            self.bullets.remove(removed_bullets)
 
-        if (
-            self.large_missile.is_alive
-            and self.station.is_alive
-            and self.is_colliding(self.large_missile, self.station)
-        ):
-            self.destroy_station(is_non_interactive)
-            return
+    def play_sounds(self, sounds):
+        """まとめた効果音を起きた順に鳴らす (同じフレームで同じ効果音は鳴らし直さない)"""
+        for sound_no in dict.fromkeys(sounds):
+            self.play_se(sound_no)
+        sounds.clear()
 
-    def destroy_station(self, is_for_demo=False):
+    def destroy_station(self, sounds, is_for_demo=False):
         if not self.station.is_alive:
             return
         self.station.is_alive = False
-        self.play_se(33)
+        self.step_events.append("destroy_station")
+        sounds.append(33)
         self.create_particle_burst(
             self.station.x + self.station.w / 2,
             self.station.y + self.station.h / 2,
-            {"count": 100, "color": 5, "life": 120, "speed": 6, "size": 4},
+            STATION_BURST,
         )
         if is_for_demo:
             self.station.is_alive = True
-            self.large_missile.x = pyxel.width - 50
+            for missile in self.large_missiles:
+                missile.x = (SCREEN_WIDTH - 50 + missile.index * 40) * self.unit
         else:
+            # 全体の停止より先に鳴らす
+            self.play_sounds(sounds)
             self.set_game_over()
 
-    def player_hit(self):
+    def player_hit(self, sounds):
         if not self.player.is_alive:
             return
+        self.step_events.append("player_hit")
         self.create_particle_burst(
             self.player.x + self.player.w / 2,
             self.player.y + self.player.h / 2,
-            {"count": 80, "color": 8, "life": 78, "speed": 5, "size": 3},
+            PLAYER_BURST,
         )
-        self.play_se(32)
+        sounds.append(32)
         self.lives -= 1
         self.player.is_alive = False
         self.player.respawn_timer = 120
@@ -643,52 +3097,306 @@ class App:
             return
         self.game_state = GameState.GAME_OVER
         self.state_timer = 300
-        pyxel.stop()
+        self.stop_audio()
+
+    def header_values(self):
+        """SAVE_HEADER に詰める値"""
+        return (
+            self.state_formats.magic,
+            self.game_state,
+            self.frame_count,
+            self.state_timer,
+            self.score,
+            self.lives,
+            self.demo_phase,
+            self.demo_timer,
+            self.demo_walker_x,
+            self.demo_title_reveal_x,
+            self.demo_ai_direction,
+            self.demo_ai_shoot_timer,
+            self.minor_alien_respawn_timer,
+            self.barrier_disabled_timer,
+            self.is_barrier_disabled,
+            self.can_shoot,
+            self.minor_alien_count,
+            self.barrier_alien_count,
+            self.large_missile_count,
+        )
+
+    def save_state(self):
+        """ワールド全体を詰めたバイナリにして返す"""
+        player = self.player
+        formats = self.state_formats
+        parts = [
+            SAVE_HEADER.pack(*self.header_values()),
+            formats.player.pack(
+                player.x,
+                player.y,
+                player.is_alive,
+                player.respawn_timer,
+                player.invincibility_timer,
+            ),
+            STATION_STATE.pack(self.station.is_alive),
+            ENTITY_COUNTS.pack(
+                len(self.large_missiles),
+                len(self.barrier_aliens),
+                len(self.minor_aliens),
+                len(self.bullets),
+                len(self.particles),
+            ),
+        ]
+        parts.extend(
+            formats.missile.pack(m.x, m.y, m.speed, m.is_alive, m.respawn_timer)
+            for m in self.large_missiles
+        )
+        parts.extend(
+            formats.barrier_alien.pack(a.x, a.y, a.speed, a.direction, a.is_alive)
+            for a in self.barrier_aliens
+        )
+        parts.extend(
+            formats.minor_alien.pack(
+                a.original_index, a.x, a.y, a.is_falling, a.fall_speed_x, a.fall_speed_y
+            )
+            for a in self.minor_aliens
+        )
+        parts.append(self.bullets.to_bytes(formats.bullet))
+        parts.extend(stream.pack() for stream in self.random_streams)
+        # 件数が一番変わりやすいパーティクルは最後に置く
+        parts.append(self.particles.to_bytes(PARTICLE_STATE))
+        return b"".join(parts)
+
+    def load_state(self, data):
+        """save_stateで作ったバイナリからワールド全体を復元する"""
+        formats = self.state_formats
+        header = SAVE_HEADER.unpack_from(data)
+        if header[0] != formats.magic:
+            raise ValueError("セーブステートの形式が違います")
+        (
+            _,
+            self.game_state,
+            self.frame_count,
+            self.state_timer,
+            self.score,
+            self.lives,
+            self.demo_phase,
+            self.demo_timer,
+            self.demo_walker_x,
+            self.demo_title_reveal_x,
+            self.demo_ai_direction,
+            self.demo_ai_shoot_timer,
+            self.minor_alien_respawn_timer,
+            self.barrier_disabled_timer,
+            self.is_barrier_disabled,
+            self.can_shoot,
+            self.minor_alien_count,
+            self.barrier_alien_count,
+            self.large_missile_count,
+        ) = header
+        offset = SAVE_HEADER.size
+
+        player = self.player
+        (
+            player.x,
+            player.y,
+            player.is_alive,
+            player.respawn_timer,
+            player.invincibility_timer,
+        ) = formats.player.unpack_from(data, offset)
+        offset += formats.player.size
+        (self.station.is_alive,) = STATION_STATE.unpack_from(data, offset)
+        offset += STATION_STATE.size
+        (
+            missile_count,
+            barrier_alien_count,
+            minor_alien_count,
+            bullet_count,
+            particle_count,
+        ) = ENTITY_COUNTS.unpack_from(data, offset)
+        offset += ENTITY_COUNTS.size
+
+        self.large_missiles = []
+        for i in range(missile_count):
+            missile = LargeMissile(i, self.unit)
+            (
+                missile.x,
+                missile.y,
+                missile.speed,
+                missile.is_alive,
+                missile.respawn_timer,
+            ) = formats.missile.unpack_from(data, offset)
+            offset += formats.missile.size
+            self.large_missiles.append(missile)
+
+        self.barrier_aliens = []
+        for i in range(barrier_alien_count):
+            barrier_alien = BarrierAlien(i, self.unit)
+            (
+                barrier_alien.x,
+                barrier_alien.y,
+                barrier_alien.speed,
+                barrier_alien.direction,
+                barrier_alien.is_alive,
+            ) = formats.barrier_alien.unpack_from(data, offset)
+            offset += formats.barrier_alien.size
+            self.barrier_aliens.append(barrier_alien)
+
+        # 隊列と落下中の並び順もそのまま戻す (攻撃する敵の選び方が変わらないように)
+        self.minor_aliens.clear()
+        for _ in range(minor_alien_count):
+            values = formats.minor_alien.unpack_from(data, offset)
+            offset += formats.minor_alien.size
+            alien = MinorAlien(values[0], self.unit)
+            (
+                alien.x,
+                alien.y,
+                alien.is_falling,
+                alien.fall_speed_x,
+                alien.fall_speed_y,
+            ) = values[1:]
+            self.minor_aliens.add(
+                alien, ALIEN_FALLING if alien.is_falling else ALIEN_IDLE
+            )
+        alive_indices = {alien.original_index for alien in self.minor_aliens}
+        for i in range(self.minor_alien_count):
+            if i not in alive_indices:
+                self.minor_aliens.add(MinorAlien(i, self.unit), ALIEN_DESTROYED)
+
+        self.bullets.load_bytes(
+            data[offset : offset + bullet_count * formats.bullet.itemsize],
+            bullet_count,
+            formats.bullet,
+        )
+        offset += bullet_count * formats.bullet.itemsize
+
+        for stream in self.random_streams:
+            stream.unpack_from(data, offset)
+            offset += RANDOM_STREAM_STATE.size
+
+        self.particles.load_bytes(
+            data[offset : offset + particle_count * PARTICLE_STATE.itemsize],
+            particle_count,
+            PARTICLE_STATE,
+        )
+        # 補間は復元した位置から始める (復元する前の位置と混ぜない)
+        self.remember_positions()
 
     def draw(self):
-        pyxel.cls(0)
-        if self.game_state == GameState.TITLE_DEMO:
-            self.draw_demo_screen()
+        start = time.perf_counter()
+        moved = None
+        if self.worker:
+            world = self.worker.snapshots.latest()
+        elif self.unit != 1:
+            world = WorldSnapshot(self, self.interpolation_alpha())
+        elif self.interpolating:
+            # 複製を作らず、描く間だけ補間した位置に動かしておく
+            world = self
+            moved = self.move_to_interpolated(self.interpolation_alpha())
+        else:
+            world = self
+        if self.gfx is self.present_gfx:
+            self.render(world)
         else:
-            self.station.draw()
-            self.large_missile.draw()
-            self.barrier_alien.draw()
-            for alien in self.minor_aliens:
-                alien.draw()
-            self.player.draw()
-            for bullet in self.bullets:
-                bullet.draw()
-            self.draw_barrier()
-            for particle in self.particles:
-                particle.draw()
-            self.draw_ui()
-            if self.game_state == GameState.AUTO_PLAY_DEMO:
-                pyxel.text(
-                    pyxel.width / 2 - 25, 150, 'PUSH "RETURN"', pyxel.frame_count % 16
+            self.render_recorded(world)
+        if moved:
+            self.restore_positions(moved)
+        self.draw_time = time.perf_counter() - start
+        frame_time = self.update_time + self.draw_time
+        self.governor.record(frame_time)
+        self.gc_scheduler.on_frame_end(frame_time, self.is_calm())
+        if self.frame_logger:
+            self.frame_logger.record(self, world)
+        self.throughput.record(frame_time)
+        if (
+            self.frame_limit
+            and not self.headless
+            and self.throughput.frames >= self.frame_limit
+        ):
+            pyxel.quit()
+
+    def is_calm(self):
+        """GCをまとめて走らせても目立たない場面ならTrue"""
+        return self.game_state == GameState.GAME_OVER or (
+            self.game_state == GameState.TITLE_DEMO and self.demo_phase == 6
+        )
+
+    def render_recorded(self, world):
+        """描画命令を記録・結合してから描画先に再生する"""
+        buffer = self.gfx
+        buffer.begin_frame()
+        self.render(world)
+        optimized = buffer.optimized()
+        optimized.replay(self.present_gfx)
+
+        stats = self.command_stats
+        stats[0] += len(buffer)
+        stats[1] += len(optimized)
+        stats[2] += buffer.count_redundant()
+
+    def render(self, world):
+        """画面全体を描画する (worldはAppそのものかWorldSnapshot)"""
+        gfx = self.gfx
+        gfx.cls(0)
+        if world.game_state == GameState.TITLE_DEMO:
+            self.draw_demo_screen(world)
+        else:
+            world.station.draw(gfx)
+            for missile in world.large_missiles:
+                missile.draw(gfx)
+            for barrier_alien in world.barrier_aliens:
+                barrier_alien.draw(gfx)
+            for alien in world.minor_aliens:
+                alien.draw(gfx)
+            world.player.draw(gfx, world.frame_count)
+            world.bullets.draw(gfx)
+            self.draw_barrier(world)
+            self.draw_particles(world)
+            self.draw_ui(world)
+            if world.game_state == GameState.AUTO_PLAY_DEMO:
+                gfx.text(
+                    SCREEN_WIDTH / 2 - 25, 150, 'PUSH "RETURN"', world.frame_count % 16
                 )
-            elif self.game_state == GameState.GAME_OVER:
+            elif world.game_state == GameState.GAME_OVER:
                 self.draw_game_over_screen()
+        if self.rewind_cursor is not None:
+            seconds = (self.rewind_cursor - self.rewind.newest_frame()) / self.sim_hz
+            gfx.text(5, 5, f"REWIND {seconds:.1f}s", 7)
+        elif self.turbo_steps > 1:
+            gfx.text(5, 5, f"TURBO x{self.turbo_steps}", 7)
+
+    def draw_particles(self, world):
+        """パーティクルの点をまとめて1回で描く"""
+        if not world.particles:
+            return
+        xs, ys, cols, skipped = world.particles.visible_points(
+            self.governor.particle_cutoff
+        )
+        self.particle_draws_skipped += skipped
+        if self.gfx is pyxel:
+            self.point_layer.draw(xs, ys, cols)
+        else:
+            self.gfx.points(xs, ys, cols)
 
-    def draw_demo_screen(self):
+    def draw_demo_screen(self, world):
+        gfx = self.gfx
         title_y1, title_y2 = 100, 120
         char_width1 = 16
         total_width = len(self.title_line1) * char_width1
-        title_x = (pyxel.width - total_width) / 2
-        if 1 <= self.demo_phase < 6:
+        title_x = (SCREEN_WIDTH - total_width) / 2
+        if 1 <= world.demo_phase < 6:
             walker_y = 175
-            pyxel.rect(self.demo_walker_x, walker_y + 8, 6, 4, 8)
-            pyxel.rect(self.demo_walker_x, walker_y + 4, 6, 4, 11)
-            pyxel.rect(self.demo_walker_x, walker_y, 6, 4, 7)
+            gfx.rect(world.demo_walker_x, walker_y + 8, 6, 4, 8)
+            gfx.rect(world.demo_walker_x, walker_y + 4, 6, 4, 11)
+            gfx.rect(world.demo_walker_x, walker_y, 6, 4, 7)
         reveal_width = (
-            self.demo_title_reveal_x - title_x
-            if self.demo_phase > 1
+            world.demo_title_reveal_x - title_x
+            if world.demo_phase > 1
             else total_width + 100
         )
         char_width2 = total_width / len(self.title_line2)
         for i, char in enumerate(self.title_line1):
             char_x = title_x + i * char_width1
             if char_x < title_x + reveal_width:
-                pyxel.text(
+                gfx.text(
                     char_x,
                     title_y1,
                     char,
@@ -697,46 +3405,269 @@ class App:
         for i, char in enumerate(self.title_line2):
             char_x = title_x + i * char_width2
             if char_x < title_x + reveal_width:
-                pyxel.text(
+                gfx.text(
                     char_x,
                     title_y2,
                     char,
                     self.title_colors[(i + 2) % len(self.title_colors)],
                 )
 
-    def draw_barrier(self):
-        if self.is_barrier_disabled:
+    def draw_barrier(self, world):
+        if world.is_barrier_disabled:
             return
-        time = pyxel.frame_count
-        barrier_colors = [10, 11, 12, 5, 9, 8]
+        gfx = self.gfx
+        time = world.barrier_time
         color_change_speed = 45
-        current_color = barrier_colors[
-            (time // color_change_speed) % len(barrier_colors)
+        current_color = BARRIER_COLORS[
+            int(time // color_change_speed) % len(BARRIER_COLORS)
         ]
-        for x in range(pyxel.width):
-            dynamic_amplitude = self.barrier_amplitude + 2 * math.sin(time / 20.0)
+        dynamic_amplitude = self.barrier_amplitude + 2 * math.sin(time / 20.0)
+        # 負荷が高いときは数列おきに計算し、その幅の矩形で埋める
+        stride = self.governor.barrier_stride
+        for x in range(0, SCREEN_WIDTH, stride):
             y = (
                 self.barrier_y
                 + math.sin(x * self.barrier_frequency - time / 1.5) * dynamic_amplitude
             )
-            pyxel.line(
+            gfx.rect(
                 x,
                 y - self.barrier_thickness,
-                x,
-                y + self.barrier_thickness,
+                stride,
+                self.barrier_thickness * 2 + 1,
                 current_color,
             )
 
-    def draw_ui(self):
-        pyxel.text(10, pyxel.height - 10, f"LIVES:{self.lives}", 7)
-        score_text = f"SCORE:{self.score}"
-        score_width = len(score_text) * 4
-        pyxel.text(pyxel.width - score_width - 10, pyxel.height - 10, score_text, 7)
+    def draw_ui(self, world):
+        gfx = self.gfx
+        # 値が変わったときだけ文字列を作り直す
+        if world.lives != self.ui_lives:
+            self.ui_lives = world.lives
+            self.lives_text = f"LIVES:{world.lives}"
+        if world.score != self.ui_score:
+            self.ui_score = world.score
+            self.score_text = f"SCORE:{world.score}"
+            self.score_x = SCREEN_WIDTH - len(self.score_text) * 4 - 10
+        gfx.text(10, SCREEN_HEIGHT - 10, self.lives_text, 7)
+        gfx.text(self.score_x, SCREEN_HEIGHT - 10, self.score_text, 7)
 
     def draw_game_over_screen(self):
+        gfx = self.gfx
         text = "GAME OVER"
         text_width = len(text) * 4
-        pyxel.text(pyxel.width / 2 - text_width / 2, pyxel.height / 2, text, 8)
-
+        gfx.text(SCREEN_WIDTH / 2 - text_width / 2, SCREEN_HEIGHT / 2, text, 8)
+
+
+# --- 描画しない描画先 ---
+class NullRenderer:
+    """何も描かない描画先 (ゲーム側の処理や割り当てだけを測るために使う)"""
+
+    def cls(self, col):
+        pass
+
+    def rect(self, x, y, w, h, col):
+        pass
+
+    def pset(self, x, y, col):
+        pass
+
+    def line(self, x1, y1, x2, y2, col):
+        pass
+
+    def text(self, x, y, s, col):
+        pass
+
+    def points(self, xs, ys, cols):
+        pass
+
+
+def build_argument_parser():
+    """モードごとのサブコマンドを持つ引数パーサーを作る
+
+    各サブコマンドには、そのモードで実際に使うオプションだけを持たせる。
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--seed", type=int, help="乱数のシード (省略時は毎回変わる)")
+    common.add_argument("--frames", type=int, help="このフレーム数を進めたら終了する")
+    common.add_argument("--fps", type=int, default=60, help="1秒あたりのフレーム数")
+    common.add_argument(
+        "--sim-hz",
+        type=int,
+        help="1秒あたりの計算の回数 (60か30で --fps 以下、省略時は速いほう。間は補間して描く)",
+    )
+    common.add_argument(
+        "--turbo",
+        type=int,
+        default=1,
+        metavar="K",
+        help="1フレームに K 回進める (PAGEUP/PAGEDOWN で変えられる)",
+    )
+    common.add_argument(
+        "--fixed-point", action="store_true", help="固定小数点でシミュレーションする"
+    )
+    common.add_argument(
+        "--no-particles", action="store_true", help="パーティクルを出さない"
+    )
+    common.add_argument(
+        "--hash-state", action="store_true", help="毎フレームの状態のハッシュを取る"
+    )
+    common.add_argument(
+        "--frame-log", metavar="PATH", help="フレーム時間の記録をJSONLに追記する"
+    )
+    common.add_argument(
+        "--auto-gc", action="store_true", help="GCのタイミングを自分で決めない"
+    )
+    window = argparse.ArgumentParser(add_help=False)
+    window.add_argument("--scale", type=int, help="ウィンドウの表示倍率")
+    window.add_argument(
+        "--threaded", action="store_true", help="シミュレーションを別スレッドで回す"
+    )
+    window.add_argument(
+        "--rewind", action="store_true", help="BACKSPACEで直近10秒を巻き戻す"
+    )
+    window.add_argument(
+        "--record-commands",
+        action="store_true",
+        help="描画命令を記録してまとめてから送る",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Barrier Attack (モードを省略すると interactive)"
+    )
+    modes = parser.add_subparsers(dest="mode", metavar="MODE")
+    interactive = modes.add_parser(
+        "interactive", parents=[common, window], help="ウィンドウで遊ぶ"
+    )
+    interactive.add_argument(
+        "--record-input", metavar="PATH", help="終了時に入力をリプレイファイルに書く"
+    )
+    interactive.add_argument(
+        "--stress", action="store_true", help="敵の数を増やしながら計測する"
+    )
+    modes.add_parser(
+        "attract", parents=[common, window], help="デモだけを繰り返す (店頭用)"
+    )
+    modes.add_parser(
+        "headless", parents=[common], help="ウィンドウを開かずに --frames だけ進める"
+    )
+    replay = modes.add_parser(
+        "replay", parents=[common, window], help="リプレイファイルの入力で進める"
+    )
+    replay.add_argument("path", help="interactive --record-input で書いたファイル")
+    replay.add_argument(
+        "--window", action="store_true", help="ヘッドレスではなくウィンドウで再生する"
+    )
+    bench = modes.add_parser(
+        "bench", parents=[common], help="連射するデモの処理能力をヘッドレスで測る"
+    )
+    bench.add_argument("--minor-aliens", type=int, default=16, help="出す小さい敵の数")
+    return parser
+
+
+def print_throughput(mode, args, app, **extra):
+    """処理能力の結果を1行のJSONで出す"""
+    result = {"mode": mode, "seed": args.seed, "fps": args.fps}
+    result.update(app.throughput.result())
+    result["steps"] = app.frame_count // app.tick
+    if app.command_stats[0]:
+        result["render_commands"] = dict(zip(RENDER_COMMAND_NAMES, app.command_stats))
+    result.update(extra)
+    print(json.dumps(result))
+
+
+def main(argv):
+    # モードを省略したときはウィンドウで遊ぶ
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["interactive", *argv]
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+    mode = args.mode
+
+    if args.seed is None:
+        # 記録や報告から同じゲームを再現できるよう、シードはここで決めておく
+        args.seed = random.randrange(1 << 32)
+    try:
+        simulation_rates(args.fps, args.sim_hz)
+    except ValueError as e:
+        parser.error(str(e))
+    options = dict(
+        seed=args.seed,
+        fps=args.fps,
+        sim_hz=args.sim_hz,
+        turbo=max(1, min(TURBO_MAX_STEPS, args.turbo)),
+        particles=not args.no_particles,
+        state_hash=args.hash_state,
+        fixed_point=args.fixed_point,
+        gc_schedule=not args.auto_gc,
+        frame_log=args.frame_log,
+    )
+    if mode in ("interactive", "attract", "replay"):
+        options.update(
+            threaded=args.threaded,
+            rewind=args.rewind,
+            record_commands=args.record_commands,
+        )
 
-App()
+    if mode == "replay":
+        settings, replay_input = load_replay(args.path)
+        options.update(settings, input_source=replay_input)
+        args.seed, args.fps = settings["seed"], settings.get("fps", 60)
+        frames = args.frames or len(replay_input)
+        if not args.window:
+            app = App(headless=True, **options)
+            app.run_headless(frames)
+            hasher = StateHasher(app.state_formats)
+            print_throughput(mode, args, app, state_hash=hasher.hash(app))
+            return 0
+        args.frames = frames
+
+    if mode == "headless" or mode == "bench":
+        app = App(headless=True, **options)
+        frames = args.frames or 3600
+        if mode == "bench":
+            # 描画は数えず、連射し続けるデモのシミュレーションだけを測る
+            app.gfx = app.present_gfx = NullRenderer()
+            app.minor_alien_count = args.minor_aliens
+            app.auto_fire_interval = 4
+            app.start_autoplay_demo()
+            app.state_timer = frames * app.turbo_steps * app.tick + 1
+        app.run_headless(frames)
+        if mode == "bench":
+            print_throughput(mode, args, app, minor_aliens=app.minor_alien_count)
+        else:
+            print_throughput(mode, args, app)
+        return 0
+
+    # ウィンドウのモードは pyxel.run から戻らないので、結果は終了時に出す
+    recorder = None
+    if mode == "interactive" and args.record_input:
+        recorder = InputRecorder(sample_input)
+        options["input_source"] = recorder
+
+    def report(app):
+        if recorder:
+            recorder.save(
+                args.record_input,
+                seed=args.seed,
+                fixed_point=args.fixed_point,
+                fps=args.fps,
+                sim_hz=args.sim_hz,
+                turbo=options["turbo"],
+                rewind=args.rewind,
+            )
+        if app.frame_logger:
+            app.frame_logger.close()
+        print_throughput(mode, args, app)
+
+    App(
+        stress_test=mode == "interactive" and args.stress,
+        attract=mode == "attract",
+        display_scale=args.scale,
+        frame_limit=args.frames,
+        on_exit=report,
+        **options,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
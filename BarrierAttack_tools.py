@@ -0,0 +1,776 @@
+# Barrier Attack の開発用ツール (ゲーム本体の BarrierAttack_py2.py を読み込んで使う)
+import pyxel
+import argparse
+from collections import Counter
+import cProfile
+import gc
+import json
+import os
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import BarrierAttack_py2
+from BarrierAttack_py2 import (
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+    STATION_BURST,
+    TURBO_MAX_STEPS,
+    App,
+    NullRenderer,
+    ParticleArrays,
+    PointLayer,
+    percentile,
+    simulation_rates,
+)
+
+# 割り当ての内訳を行ごとに集めるファイル
+GAME_FILE = BarrierAttack_py2.__file__
+
+
+# --- 割り当ての計測 ---
+class AllocationTracer:
+    """ゲーム本体の行ごとに、実行中に増えたメモリのピークを集計する"""
+
+    def __init__(self):
+        self.filename = GAME_FILE
+        self.site = None
+        self.start = 0
+        self.bytes = Counter()
+        self.counts = Counter()
+        self.overhead = 0  # 計測処理そのものが割り当てる分
+        # 呼ぶたびにバウンドメソッドが作られないように保持しておく
+        self.local_trace = self.trace
+
+    def flush(self):
+        grown = tracemalloc.get_traced_memory()[1] - self.start - self.overhead
+        if grown > 0 and self.site:
+            self.bytes[self.site] += grown
+            self.counts[self.site] += 1
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+
+    def trace(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        self.flush()
+        if event == "return":
+            caller = frame.f_back
+            if caller and caller.f_code.co_filename == self.filename:
+                self.site = caller.f_lineno
+            else:
+                self.site = None
+        else:
+            self.site = frame.f_lineno
+        return self.local_trace
+
+    def start_tracing(self):
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+        sys.settrace(self.local_trace)
+
+    def stop_tracing(self):
+        sys.settrace(None)
+        self.flush()
+        self.site = None
+
+    def calibrate(self):
+        """何も割り当てない行と呼び出しで計測処理自体の増分を求める"""
+        self.overhead = 0
+        # calibration_call はこのファイルにあるので、その間だけこのファイルを追跡する
+        self.filename = __file__
+        for _ in range(3):
+            self.start_tracing()
+            for _ in range(20):
+                calibration_call(0)
+            self.stop_tracing()
+            events = sum(self.counts.values())
+            if events:
+                self.overhead += max(self.bytes.values()) // max(self.counts.values())
+            self.bytes.clear()
+            self.counts.clear()
+        self.filename = GAME_FILE
+
+
+def calibration_call(value):
+    """AllocationTracer.calibrateで使う、何も割り当てない関数"""
+    if value:
+        return value
+    return None
+
+
+def entity_counts(app):
+    return (
+        len(app.particles),
+        len(app.bullets),
+        len(app.minor_aliens),
+        len(app.large_missiles),
+        len(app.barrier_aliens),
+    )
+
+
+def setup_title(app):
+    pass
+
+
+def setup_autoplay(app):
+    app.start_autoplay_demo()
+    app.state_timer = 100000
+
+
+def setup_game_over(app):
+    app.init_entities()
+    app.set_game_over()
+    app.state_timer = 100000
+
+
+ALLOCATION_SCENARIOS = [
+    ("title", setup_title),
+    ("autoplay", setup_autoplay),
+    ("game_over", setup_game_over),
+]
+
+
+def run_allocation_check(
+    frames=600, warmup_frames=120, trace_frames=30, budget=2048, seed=0
+):
+    """ヘッドレスでシナリオを動かし、1フレームあたりの割り当てを報告する
+
+    エンティティが増えず、そのフレームと直前のフレームに爆発などの出来事も
+    なかったフレームを定常状態とみなし、その中で割り当てたバイト数が
+    予算を超えたフレームがあればFalseを返す。
+    """
+    with open(GAME_FILE, encoding="utf-8") as fin:
+        source_lines = fin.read().splitlines()
+    ok = True
+    for name, setup in ALLOCATION_SCENARIOS:
+        app = App(headless=True, seed=seed)
+        app.gfx = app.present_gfx = NullRenderer()
+        setup(app)
+        app.run_headless(warmup_frames)
+
+        tracemalloc.start()
+        # 追跡を始める前に確保したものの解放は数えられないので、最初の1フレームは測らない
+        app.update()
+        app.draw()
+        steady_bytes = []
+        retained_total = 0
+        for _ in range(frames):
+            counts = entity_counts(app)
+            state = app.game_state
+            # 出来事の直後は、新しく出たパーティクルの数値が初めて更新される
+            had_events = bool(app.frame_events)
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            app.update()
+            app.draw()
+            current, peak = tracemalloc.get_traced_memory()
+            retained_total += current - start
+            if (
+                state == app.game_state
+                and not had_events
+                and not app.frame_events
+                and all(
+                    after <= before for before, after in zip(counts, entity_counts(app))
+                )
+            ):
+                steady_bytes.append(peak - start)
+
+        # 行ごとの内訳は別の区間で追跡する (追跡中は遅いため)
+        tracer = AllocationTracer()
+        tracer.calibrate()
+        for _ in range(trace_frames):
+            tracer.start_tracing()
+            app.update()
+            app.draw()
+            tracer.stop_tracing()
+        tracemalloc.stop()
+
+        steady_bytes.sort()
+        worst = steady_bytes[-1] if steady_bytes else 0
+        print(
+            f"[{name}] 定常 {len(steady_bytes)}/{frames}フレーム:"
+            f" p50 {percentile(steady_bytes, 0.5)} B,"
+            f" p99 {percentile(steady_bytes, 0.99)} B, 最大 {worst} B,"
+            f" 保持 {retained_total / frames:+.0f} B/フレーム"
+        )
+        for line, total in tracer.bytes.most_common(8):
+            print(
+                f"    {total / trace_frames:8.1f} B {tracer.counts[line] / trace_frames:6.2f}回"
+                f"  {line:5d}: {source_lines[line - 1].strip()}"
+            )
+        if worst > budget:
+            print(f"    予算 {budget} B を超えています")
+            ok = False
+    return ok
+
+
+# --- 長時間実行 ---
+def read_rss():
+    """/proc から常駐メモリのバイト数を読む (読めない環境ではNone)"""
+    try:
+        with open("/proc/self/statm") as fin:
+            pages = int(fin.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+# 長時間実行で集める値 (名前, 単位)
+SOAK_METRICS = (
+    ("rss", "MB"),
+    ("gc_objects", ""),
+    ("particles", ""),
+    ("bullets", ""),
+    ("minor_aliens", ""),
+    ("large_missiles", ""),
+    ("barrier_aliens", ""),
+    ("missile_speed", "px/f"),
+    ("frame_time", "us"),
+)
+
+
+class SoakMonitor:
+    """一定間隔で値を集め、実行時間に比例して増え続けているものを見つける
+
+    最初の warmup_ratio の標本は立ち上がりとして除き、残りに直線を当てはめる。
+    その傾きで標本の期間に増える量が、平均の growth_ratio 倍と標準偏差の
+    noise_ratio 倍のどちらも超えたら増加とみなす (ばらつくだけの値は除く)。
+    """
+
+    def __init__(self, warmup_ratio=0.1, growth_ratio=0.1, noise_ratio=2):
+        self.warmup_ratio = warmup_ratio
+        self.growth_ratio = growth_ratio
+        self.noise_ratio = noise_ratio
+        self.frames = []
+        self.samples = {name: [] for name, _ in SOAK_METRICS}
+
+    def sample(self, app, frame, frame_time):
+        rss = read_rss()
+        values = {
+            "rss": rss / 1e6 if rss is not None else 0.0,
+            "gc_objects": len(gc.get_objects()),
+            "particles": len(app.particles),
+            "bullets": len(app.bullets),
+            "minor_aliens": len(app.minor_aliens),
+            "large_missiles": len(app.large_missiles),
+            "barrier_aliens": len(app.barrier_aliens),
+            "missile_speed": max(
+                (m.speed / app.unit for m in app.large_missiles), default=0.0
+            ),
+            "frame_time": frame_time * 1e6,
+        }
+        self.frames.append(frame)
+        for name, value in values.items():
+            self.samples[name].append(value)
+        return values
+
+    def growth(self):
+        """値ごとに (100万フレームあたりの傾き, 増加とみなしたか) を返す"""
+        start = int(len(self.frames) * self.warmup_ratio)
+        frames = np.array(self.frames[start:], np.float64)
+        result = {}
+        for name, _ in SOAK_METRICS:
+            values = np.array(self.samples[name][start:], np.float64)
+            if len(values) < 3:
+                result[name] = (0.0, False)
+                continue
+            slope = np.polyfit(frames, values, 1)[0]
+            increase = slope * (frames[-1] - frames[0])
+            limit = max(
+                self.growth_ratio * abs(values.mean()),
+                self.noise_ratio * values.std(),
+                1e-9,
+            )
+            result[name] = (slope * 1e6, increase > limit)
+        return result
+
+
+def run_soak_test(frames=10_000_000, interval=100_000, seed=0, log_path=None):
+    """タイトルとデモの繰り返しをヘッドレスで長時間回し、増え続ける値がないか調べる
+
+    interval フレームごとにメモリ、オブジェクト数、エンティティ数、フレーム時間を
+    記録する (log_path があればJSONLにも書く)。増え続ける値がなければTrueを返す。
+    Ctrl+Cで止めたときも、それまでの標本で判定する。
+    """
+    app = App(headless=True, seed=seed)
+    app.gfx = app.present_gfx = NullRenderer()
+    monitor = SoakMonitor()
+    log = open(log_path, "a") if log_path else None
+    print(
+        "frame | " + " | ".join(f"{name} {unit}".strip() for name, unit in SOAK_METRICS)
+    )
+    app.gc_scheduler.start()
+    try:
+        frame = 0
+        while frame < frames:
+            total_time = 0
+            for _ in range(min(interval, frames - frame)):
+                app.update()
+                app.draw()
+                total_time += app.update_time + app.draw_time
+            count = min(interval, frames - frame)
+            frame += count
+            values = monitor.sample(app, frame, total_time / count)
+            print(f"{frame} | " + " | ".join(f"{v:.6g}" for v in values.values()))
+            if log:
+                log.write(json.dumps({"frame": frame, **values}) + "\n")
+                log.flush()
+    except KeyboardInterrupt:
+        print("中断しました")
+    finally:
+        app.gc_scheduler.stop()
+        if log:
+            log.close()
+
+    ok = True
+    for name, (slope, is_growing) in monitor.growth().items():
+        if is_growing:
+            ok = False
+        mark = "増加" if is_growing else "ok"
+        print(f"  {name:15s} {slope:+12.4g} /100万フレーム  {mark}")
+    return ok
+
+
+# --- プロファイル ---
+def profile_label(func):
+    """pstats の関数キーを折りたたみスタックの1段の名前にする"""
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats, min_time=1e-6, max_depth=64):
+    """pstats の呼び出し元の情報から、フレームグラフ用の折りたたみスタックを作る
+
+    cProfile は呼び出しの組しか持たないので、呼び出し元ごとの累積時間の比で
+    呼び出し先の時間を分けて木にする。返り値はマイクロ秒単位の行のリスト。
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    totals = Counter()
+
+    def walk(func, stack, scale, on_stack):
+        _, _, self_time, total_time, _ = stats.stats[func]
+        stack = stack + (profile_label(func),)
+        totals[";".join(stack)] += self_time * scale
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats.stats[callee][3]
+            if callee in on_stack or callee_total <= 0:
+                continue
+            callee_scale = scale * edge_time / callee_total
+            if callee_total * callee_scale < min_time:
+                continue
+            walk(callee, stack, callee_scale, on_stack | {callee})
+
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        # 計測を止める呼び出し自体も記録されるので除く
+        if not callers and "_lsprof.Profiler" not in func[2]:
+            walk(func, (), 1.0, {func})
+    return [
+        f"{stack} {round(seconds * 1e6)}"
+        for stack, seconds in sorted(totals.items())
+        if seconds * 1e6 >= 0.5
+    ]
+
+
+class FrameProfiler:
+    """start_frame から end_frame の手前までの update と draw だけを cProfile で計測する
+
+    終わったら path に pstats の形式で、path + ".folded" に折りたたみスタックで書き出す。
+    """
+
+    def __init__(self, start_frame, end_frame, path):
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.path = path
+        self.frame = 0
+        self.profile = cProfile.Profile()
+
+    def is_recording(self):
+        return self.start_frame <= self.frame < self.end_frame
+
+    def wrap(self, update, draw):
+        """計測を入り切りする update と draw を返す (その外側の処理は計測しない)"""
+
+        def profiled_update():
+            if not self.is_recording():
+                update()
+                return
+            self.profile.enable()
+            try:
+                update()
+            finally:
+                self.profile.disable()
+
+        def profiled_draw():
+            if self.is_recording():
+                self.profile.enable()
+                try:
+                    draw()
+                finally:
+                    self.profile.disable()
+            else:
+                draw()
+            self.frame += 1
+            if self.frame == self.end_frame:
+                self.write()
+
+        return profiled_update, profiled_draw
+
+    def write(self):
+        self.profile.dump_stats(self.path)
+        stats = pstats.Stats(self.profile)
+        lines = collapsed_stacks(stats)
+        with open(self.path + ".folded", "wt") as fout:
+            fout.writelines(line + "\n" for line in lines)
+        print(
+            f"フレーム {self.start_frame}〜{self.end_frame - 1} のプロファイルを"
+            f"書き出しました: {self.path} ({self.path}.folded)"
+        )
+        stats.sort_stats("cumulative").print_stats(15)
+
+
+def run_profile(start_frame, end_frame, path, window=False, **options):
+    """ゲームを end_frame まで動かし、start_frame からの update と draw を計測する
+
+    window がなければヘッドレスで進める。options は App にそのまま渡す。
+    """
+    profiler = FrameProfiler(start_frame, end_frame, path)
+    if window:
+        App(frame_limit=end_frame, profiler=profiler, **options)
+        return
+    app = App(headless=True, profiler=profiler, **options)
+    app.run_headless(end_frame)
+
+
+# --- 検査とベンチマーク ---
+def run_golden_check(path, frames=1800, interval=30, seed=0, update=False):
+    """ヘッドレスで描いたフレームのハッシュをゴールデンファイルと比べる
+
+    update なら比べずに今回のハッシュを書き出す。一致すればTrueを返す。
+    """
+    if not update and not os.path.exists(path):
+        print(f"ゴールデンファイルがありません (--update で書き出せます): {path}")
+        return False
+    app = App(headless=True, seed=seed)
+    hashes = []
+    for frame in range(frames):
+        app.update()
+        app.draw()
+        if frame % interval == 0:
+            hashes.append(app.gfx.frame_hash())
+
+    if update:
+        with open(path, "wt") as fout:
+            json.dump({"seed": seed, "interval": interval, "hashes": hashes}, fout)
+        print(f"ゴールデンファイルを書き出しました: {path}")
+        return True
+
+    with open(path, "rt") as fin:
+        golden = json.load(fin)
+    mismatches = [
+        i * interval
+        for i, (expected, actual) in enumerate(zip(golden["hashes"], hashes))
+        if expected != actual
+    ]
+    if mismatches:
+        print(f"ゴールデンイメージと一致しないフレーム: {mismatches}")
+        return False
+    if len(golden["hashes"]) != len(hashes):
+        print(f"フレーム数が記録と違います ({len(golden['hashes'])} と {len(hashes)})")
+        return False
+    print(f"{len(hashes)}フレームがゴールデンイメージと一致しました")
+    return True
+
+
+def run_state_hash_check(path, frames=3600, seed=0, fixed_point=False, update=False):
+    """ヘッドレスで進めた毎フレームの状態のハッシュを記録済みのものと比べる
+
+    パーティクルはゲームの進行に関わらないので出さない。update なら比べずに
+    今回のハッシュを書き出す。一致すればTrueを返す。
+    """
+    expected = None
+    if not update:
+        if not os.path.exists(path):
+            print(f"状態のハッシュの記録がありません (--update で書き出せます): {path}")
+            return False
+        with open(path, "rt") as fin:
+            expected = json.load(fin)
+        # 固定小数点のフラグがない記録は浮動小数点のモードで書いたもの
+        if expected.get("fixed_point", False) != fixed_point:
+            mode = "固定小数点" if expected.get("fixed_point", False) else "浮動小数点"
+            print(
+                f"記録は{mode}のモードで書いたものです (--fixed-point の有無を合わせてください)"
+            )
+            return False
+    app = App(
+        headless=True,
+        seed=seed,
+        particles=False,
+        state_hash=True,
+        fixed_point=fixed_point,
+    )
+    app.gfx = app.present_gfx = NullRenderer()
+    app.auto_fire_interval = 20
+    hashes = []
+    start = time.perf_counter()
+    hash_time = 0
+    for _ in range(frames):
+        app.step()
+        hash_start = time.perf_counter()
+        hashes.append(app.state_hasher.hash(app))
+        hash_time += time.perf_counter() - hash_start
+    elapsed = time.perf_counter() - start
+    print(
+        f"{frames}フレーム {elapsed:.2f}秒,"
+        f" ハッシュ 平均 {hash_time / frames * 1e6:.1f} us/フレーム"
+    )
+
+    if expected is None:
+        with open(path, "wt") as fout:
+            json.dump(
+                {"seed": seed, "fixed_point": fixed_point, "hashes": hashes}, fout
+            )
+        print(f"状態のハッシュを書き出しました: {path}")
+        return True
+
+    expected = expected["hashes"]
+    for frame, (a, b) in enumerate(zip(expected, hashes)):
+        if a != b:
+            print(f"フレーム {frame} で状態が記録と違います")
+            return False
+    if len(expected) != len(hashes):
+        print(f"フレーム数が記録と違います ({len(expected)} と {len(hashes)})")
+        return False
+    print(f"{len(hashes)}フレームの状態が記録と一致しました")
+    return True
+
+
+def run_fixed_point_benchmark(counts=(16, 1024, 4096), frames=600, seed=0):
+    """同じシードのデモを浮動小数点と固定小数点で進め、更新、ハッシュ、保存の時間を比べる"""
+    print("minor aliens | mode  | step ms | hash us | save us | save bytes")
+    for count in counts:
+        for fixed_point in (False, True):
+            app = App(
+                headless=True,
+                seed=seed,
+                particles=False,
+                state_hash=True,
+                fixed_point=fixed_point,
+            )
+            app.gfx = app.present_gfx = NullRenderer()
+            app.minor_alien_count = count
+            app.auto_fire_interval = 4
+            app.start_autoplay_demo()
+            app.state_timer = frames + 1
+            start = time.perf_counter()
+            for _ in range(frames):
+                app.step()
+            step_time = (time.perf_counter() - start) / frames
+            start = time.perf_counter()
+            for _ in range(frames):
+                app.state_hasher.hash(app)
+            hash_time = (time.perf_counter() - start) / frames
+            start = time.perf_counter()
+            for _ in range(frames):
+                state = app.save_state()
+            save_time = (time.perf_counter() - start) / frames
+            print(
+                f"{count:12d} | {'fixed' if fixed_point else 'float'}"
+                f" | {step_time * 1000:7.3f} | {hash_time * 1e6:7.1f}"
+                f" | {save_time * 1e6:7.1f} | {len(state):10d}"
+            )
+
+
+def run_particle_benchmark(counts=(100, 1000, 10000), frames=60, seed=0):
+    """パーティクルの更新と、1個ずつpsetする描画とまとめて描く描画の時間を比べる"""
+    rng = random.Random(seed)
+    screen = pyxel.Image(SCREEN_WIDTH, SCREEN_HEIGHT)
+    layer = PointLayer()
+    print("particles | update ms | pset ms | batched ms | 描画の速度比")
+    for count in counts:
+        particles = ParticleArrays(count)
+        while len(particles) < count:
+            preset = STATION_BURST
+            preset.spawn(
+                particles,
+                rng.uniform(0, SCREEN_WIDTH),
+                rng.uniform(0, SCREEN_HEIGHT),
+                min(preset.count, count - len(particles)),
+                rng.randrange(preset.table_size),
+            )
+        records = list(
+            zip(
+                *(
+                    getattr(particles, name)[:count].tolist()
+                    for name in ("x", "y", "life", "start_life", "color")
+                )
+            )
+        )
+
+        update_time = pset_time = batched_time = 0
+        for _ in range(frames):
+            # 数が減らないように複製を更新する
+            moved = particles.copy()
+            start = time.perf_counter()
+            moved.update()
+            update_time += time.perf_counter() - start
+
+            # 以前と同じく1個ずつ色を選んでpsetする
+            start = time.perf_counter()
+            for x, y, life, start_life, color in records:
+                if life < start_life / 3:
+                    screen.pset(x, y, 1)
+                elif life < start_life * 2 / 3:
+                    screen.pset(x, y, 6)
+                else:
+                    screen.pset(x, y, color)
+            pset_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            xs, ys, cols, _ = particles.visible_points(0)
+            layer.draw(xs, ys, cols, screen)
+            batched_time += time.perf_counter() - start
+
+        print(
+            f"{count:9d} | {update_time * 1000 / frames:9.3f} |"
+            f" {pset_time * 1000 / frames:7.3f} |"
+            f" {batched_time * 1000 / frames:10.3f} |"
+            f" {pset_time / batched_time:.1f}倍"
+        )
+
+
+def build_argument_parser():
+    """ツールごとのサブコマンドを持つ引数パーサーを作る"""
+    seeded = argparse.ArgumentParser(add_help=False)
+    seeded.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    common = argparse.ArgumentParser(add_help=False, parents=[seeded])
+    common.add_argument(
+        "--frames", type=int, help="進めるフレーム数 (省略時はツールごとの既定値)"
+    )
+
+    parser = argparse.ArgumentParser(description="Barrier Attack の開発用ツール")
+    tools = parser.add_subparsers(dest="tool", metavar="TOOL", required=True)
+    tools.add_parser(
+        "alloc-check", parents=[common], help="定常フレームの割り当てを調べる"
+    )
+    golden = tools.add_parser(
+        "golden", parents=[common], help="描いたフレームをゴールデンファイルと比べる"
+    )
+    golden.add_argument("path")
+    golden.add_argument(
+        "--update", action="store_true", help="比べずに今回のハッシュで書き直す"
+    )
+    state_hashes = tools.add_parser(
+        "state-hashes", parents=[common], help="状態のハッシュを記録と比べる"
+    )
+    state_hashes.add_argument("path")
+    state_hashes.add_argument(
+        "--fixed-point",
+        action="store_true",
+        help="固定小数点でシミュレーションする (記録と同じモードで比べる)",
+    )
+    state_hashes.add_argument(
+        "--update", action="store_true", help="比べずに今回のハッシュで書き直す"
+    )
+    soak = tools.add_parser(
+        "soak", parents=[common], help="長時間回して増え続ける値を探す"
+    )
+    soak.add_argument("--interval", type=int, default=100_000)
+    soak.add_argument("--log", metavar="PATH", help="標本をJSONLに追記する")
+    profile = tools.add_parser(
+        "profile",
+        parents=[seeded],
+        help="START〜END-1 フレームを cProfile で計測する (END フレームで終える)",
+    )
+    profile.add_argument("start", type=int, metavar="START")
+    profile.add_argument("end", type=int, metavar="END")
+    profile.add_argument(
+        "path", metavar="PATH", help="pstats の書き出し先 (PATH.folded も書く)"
+    )
+    profile.add_argument("--fps", type=int, default=60, help="1秒あたりのフレーム数")
+    profile.add_argument(
+        "--sim-hz",
+        type=int,
+        help="1秒あたりの計算の回数 (省略時は --fps 以下で速いほう)",
+    )
+    profile.add_argument(
+        "--turbo", type=int, default=1, metavar="K", help="1フレームに K 回進める"
+    )
+    profile.add_argument(
+        "--fixed-point", action="store_true", help="固定小数点でシミュレーションする"
+    )
+    profile.add_argument(
+        "--no-particles", action="store_true", help="パーティクルを出さない"
+    )
+    profile.add_argument(
+        "--window", action="store_true", help="ヘッドレスではなくウィンドウで動かす"
+    )
+    bench = tools.add_parser("bench", parents=[common], help="比較ベンチマーク")
+    bench.add_argument(
+        "--suite",
+        choices=("particles", "fixed"),
+        default="particles",
+        help="particles: パーティクルの描画, fixed: 浮動小数点と固定小数点",
+    )
+    return parser
+
+
+def main(argv):
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+    tool, seed = args.tool, args.seed
+
+    if tool == "alloc-check":
+        frames = args.frames or 600
+        return 0 if run_allocation_check(frames, seed=seed) else 1
+    if tool == "golden":
+        frames = args.frames or 1800
+        ok = run_golden_check(args.path, frames, seed=seed, update=args.update)
+        return 0 if ok else 1
+    if tool == "state-hashes":
+        frames = args.frames or 3600
+        ok = run_state_hash_check(
+            args.path, frames, seed, args.fixed_point, args.update
+        )
+        return 0 if ok else 1
+    if tool == "profile":
+        try:
+            simulation_rates(args.fps, args.sim_hz)
+        except ValueError as e:
+            parser.error(str(e))
+        run_profile(
+            args.start,
+            args.end,
+            args.path,
+            window=args.window,
+            seed=seed,
+            fps=args.fps,
+            sim_hz=args.sim_hz,
+            turbo=max(1, min(TURBO_MAX_STEPS, args.turbo)),
+            particles=not args.no_particles,
+            fixed_point=args.fixed_point,
+        )
+        return 0
+    if tool == "soak":
+        frames = args.frames or 10_000_000
+        return 0 if run_soak_test(frames, args.interval, seed, args.log) else 1
+    if args.suite == "particles":
+        run_particle_benchmark(frames=args.frames or 60, seed=seed)
+    else:
+        run_fixed_point_benchmark(frames=args.frames or 600, seed=seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import BarrierAttack_py2 as game  # noqa: E402
+import BarrierAttack_tools as tools  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+
+def test_frames_match_golden():
+    assert tools.run_golden_check(os.path.join(FIXTURES, "golden_frames.json"))
+
+
+def test_state_hashes_match_record():
+    assert tools.run_state_hash_check(os.path.join(FIXTURES, "state_hashes.json"))
+
+
+def test_fixed_point_state_hashes_match_record():
+    path = os.path.join(FIXTURES, "state_hashes_fixed_point.json")
+    assert tools.run_state_hash_check(path, fixed_point=True)
+
+
+def logged_state_hashes(path, threaded):
+    app = game.App(
+        headless=True, seed=11, state_hash=True, threaded=threaded, frame_log=path
+    )
+    app.run_headless(600)
+    hashes = []
+    with open(path) as fin:
+        for line in fin:
+            record = json.loads(line)
+            if record["type"] == "state_hashes":
+                hashes += record["hashes"]
+    return hashes
+
+
+def test_threaded_state_hashes_match_single_threaded(tmp_path):
+    expected = logged_state_hashes(str(tmp_path / "single.jsonl"), False)
+    actual = logged_state_hashes(str(tmp_path / "threaded.jsonl"), True)
+    # 最後の1回はワーカーが進めている途中で終わる
+    assert actual == expected[: len(actual)]
+    assert len(actual) >= len(expected) - 1